@@ -0,0 +1,224 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Timing, peak memory and correctness benchmarks with regression gates.
+
+Every benchmark is run a few times and its best wall time is kept, then once more
+under tracemalloc for its peak memory. Results that should equal those of the
+reference Counter engine are checked against it. The results are written as JSON,
+and when a baseline result file is given, the run fails if a benchmark got slower
+than the threshold ratio allows, or if any check failed.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import bleu
+from bleu.integer import Vocabulary, get_ngram_codes
+from bleu.metrics import _get_ngrams, _merge_reference_ngrams
+
+from benchmarks.corpus import CorpusConfig, generate_corpus, write_corpus
+
+
+def _measure(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def _benchmarks(translation_corpus, reference_corpus, translation_file, reference_files, max_order):
+    """Returns a list of (name, func, expected) where expected may be None."""
+    expected_score = bleu.bleu_corpus_level(translation_corpus, reference_corpus, max_order)
+    expected_sentences = [
+        bleu.bleu_sentence_level(t, r, max_order) for t, r in zip(translation_corpus, reference_corpus)
+    ]
+    translation_ngrams = [_get_ngrams(t, max_order) for t in translation_corpus]
+    reference_ngrams = [_merge_reference_ngrams(r, max_order) for r in reference_corpus]
+    vocab = Vocabulary()
+    encoded = [vocab.encode(t) for t in translation_corpus]
+
+    benchmarks = [
+        ("load/translation", lambda: bleu.load_translation_corpus(translation_file), translation_corpus),
+        ("load/reference", lambda: bleu.load_reference_corpus(reference_files), reference_corpus),
+        (
+            "load/iter_corpus",
+            lambda: list(bleu.iter_corpus(translation_file, reference_files)),
+            list(zip(translation_corpus, reference_corpus)),
+        ),
+        ("ngrams/counter", lambda: [_get_ngrams(t, max_order) for t in translation_corpus], None),
+        ("ngrams/integer", lambda: [get_ngram_codes(ids, max_order) for ids in encoded], None),
+        (
+            "clipping/counter",
+            lambda: [t & r for t, r in zip(translation_ngrams, reference_ngrams)],
+            None,
+        ),
+        (
+            "sentence/bleu_sentence_level",
+            lambda: [
+                bleu.bleu_sentence_level(t, r, max_order)
+                for t, r in zip(translation_corpus, reference_corpus)
+            ],
+            expected_sentences,
+        ),
+        (
+            "sentence/statistics",
+            lambda: bleu.sentence_scores_from_statistics(
+                bleu.bleu_statistics(translation_corpus, reference_corpus, max_order), max_order
+            ),
+            expected_sentences,
+        ),
+    ]
+    engines = ["counter", "integer"]
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        engines.append("numpy")
+    for engine in engines:
+        benchmarks.append(
+            (
+                "corpus/%s" % engine,
+                lambda engine=engine: bleu.bleu_corpus_level(
+                    translation_corpus, reference_corpus, max_order, engine=engine
+                ),
+                expected_score,
+            )
+        )
+    return benchmarks
+
+
+def run(config, max_order, repeat):
+    translation_corpus, reference_corpus = generate_corpus(config)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        translation_file = os.path.join(tmpdir, "trans.txt")
+        reference_files = [
+            os.path.join(tmpdir, "ref%d.txt" % i) for i in range(config.n_references)
+        ]
+        write_corpus(translation_corpus, reference_corpus, translation_file, reference_files)
+        for name, func, expected in _benchmarks(
+            translation_corpus, reference_corpus, translation_file, reference_files, max_order
+        ):
+            result, seconds, peak = _measure(func, repeat)
+            results[name] = {
+                "seconds": seconds,
+                "peak_bytes": peak,
+                "segments_per_second": config.n_segments / seconds if seconds else None,
+                "correct": None if expected is None else result == expected,
+            }
+    return {
+        "config": config.to_dict(),
+        "max_order": max_order,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def check(report, baseline, threshold):
+    """Returns the list of failures of a report against a baseline."""
+    failures = []
+    for name, result in sorted(report["results"].items()):
+        if result["correct"] is False:
+            failures.append("%s: result differs from the reference implementation" % name)
+        if baseline is None or name not in baseline["results"]:
+            continue
+        ratio = result["seconds"] / baseline["results"][name]["seconds"]
+        if ratio > threshold:
+            failures.append("%s: %.2fx slower than the baseline" % (name, ratio))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("--segments", type=int, default=1000)
+    parser.add_argument("--references", type=int, default=4)
+    parser.add_argument("--vocab-size", type=int, default=10000)
+    parser.add_argument("--min-length", type=int, default=5)
+    parser.add_argument("--max-length", type=int, default=40)
+    parser.add_argument("--overlap", type=float, default=0.6)
+    parser.add_argument("--repetition", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-n", "--max-order", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the best is kept")
+    parser.add_argument("-o", "--output", help="file to write the JSON results to")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+    parser.add_argument(
+        "--threshold", type=float, default=1.2, help="max allowed slowdown over the baseline"
+    )
+    args = parser.parse_args(argv)
+
+    config = CorpusConfig(
+        n_segments=args.segments,
+        n_references=args.references,
+        vocab_size=args.vocab_size,
+        min_length=args.min_length,
+        max_length=args.max_length,
+        overlap=args.overlap,
+        repetition=args.repetition,
+        seed=args.seed,
+    )
+    report = run(config, args.max_order, args.repeat)
+    for name, result in sorted(report["results"].items()):
+        print(
+            "%-32s %10.4fs %12d bytes  %s"
+            % (
+                name,
+                result["seconds"],
+                result["peak_bytes"],
+                {None: "", True: "ok", False: "WRONG"}[result["correct"]],
+            )
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = check(report, baseline, args.threshold)
+    for failure in failures:
+        print("FAIL " + failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Seeded generator of synthetic translation and reference corpora."""
+
+import bisect
+import itertools
+import random
+
+__all__ = [
+    "CorpusConfig",
+    "generate_corpus",
+    "write_corpus",
+]
+
+
+class CorpusConfig(object):
+    """Parameters of a synthetic corpus.
+
+    Attributes:
+        n_segments: number of translations.
+        n_references: number of references per translation.
+        vocab_size: number of distinct tokens. Tokens are drawn from a Zipf law.
+        min_length, max_length: range of the number of tokens of a segment.
+        overlap: probability that a translation token is copied from its first
+            reference, which controls how many n-grams match.
+        repetition: probability that a token repeats the previous one, which
+            exercises the clipping.
+        seed: seed of the random generator.
+    """
+
+    def __init__(
+        self,
+        n_segments=1000,
+        n_references=4,
+        vocab_size=10000,
+        min_length=5,
+        max_length=40,
+        overlap=0.6,
+        repetition=0.05,
+        seed=0,
+    ):
+        self.n_segments = n_segments
+        self.n_references = n_references
+        self.vocab_size = vocab_size
+        self.min_length = min_length
+        self.max_length = max_length
+        self.overlap = overlap
+        self.repetition = repetition
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class _Sampler(object):
+    def __init__(self, config):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.vocab = ["w%d" % i for i in range(config.vocab_size)]
+        self.cum_weights = list(
+            itertools.accumulate(1.0 / rank for rank in range(1, config.vocab_size + 1))
+        )
+
+    def token(self):
+        x = self.random.random() * self.cum_weights[-1]
+        return self.vocab[bisect.bisect(self.cum_weights, x)]
+
+    def segment(self, source=None):
+        config = self.config
+        length = self.random.randint(config.min_length, config.max_length)
+        segment = []
+        for i in range(length):
+            if segment and self.random.random() < config.repetition:
+                segment.append(segment[-1])
+            elif source and self.random.random() < config.overlap:
+                segment.append(source[min(i, len(source) - 1)])
+            else:
+                segment.append(self.token())
+        return segment
+
+
+def generate_corpus(config):
+    """Generates a synthetic corpus.
+
+    Returns:
+        A (translation_corpus, reference_corpus) pair, as taken by bleu_corpus_level().
+    """
+    sampler = _Sampler(config)
+    translation_corpus = []
+    reference_corpus = []
+    for _ in range(config.n_segments):
+        references = [sampler.segment() for _ in range(config.n_references)]
+        reference_corpus.append(references)
+        translation_corpus.append(sampler.segment(references[0]))
+    return translation_corpus, reference_corpus
+
+
+def write_corpus(translation_corpus, reference_corpus, translation_file, reference_files):
+    """Writes a corpus to text files, one segment per line."""
+    with open(translation_file, "w") as f:
+        for translation in translation_corpus:
+            f.write(" ".join(translation) + "\n")
+    for i, reference_file in enumerate(reference_files):
+        with open(reference_file, "w") as f:
+            for references in reference_corpus:
+                f.write(" ".join(references[i]) + "\n")
@@ -0,0 +1,321 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Memory-mapped binary format of pre-tokenized corpora.
+
+Parsing text files costs more than scoring them on big test sets, so a translation
+file or a set of reference files can be compiled once into a binary cache holding:
+
+- a vocabulary, the token of id i being at index i - 1,
+- one flat array of the token ids of all the files,
+- one table of segment offsets into that array per file, so the references of a
+  set are parallel tables over the same segments.
+
+The cache is opened with mmap and the token ids are read in place, without copy.
+It records the size, mtime and SHA-1 of every source file, and is rebuilt by
+cached_corpus() when any source has changed.
+
+To compile a cache from the command line::
+
+    python -m bleu.binary -o refs.bin ref1.txt ref2.txt ref3.txt
+"""
+
+import argparse
+import array
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from bleu.integer import ID_TYPECODE, Vocabulary, merge_reference_codes, segment_statistics
+from bleu.metrics import DEFAULT_MAX_ORDER, STATISTICS_TYPECODE
+
+__all__ = [
+    "BinaryCorpus",
+    "compile_corpus",
+    "open_corpus",
+    "cached_corpus",
+    "binary_statistics",
+]
+
+MAGIC = b"BLEUBIN\0"
+
+VERSION = 1
+
+# Magic, version and length of the JSON header.
+_PREAMBLE = struct.Struct("<8sII")
+
+OFFSET_TYPECODE = "q"
+
+
+def _fingerprint(file):
+    stat = os.stat(file)
+    sha1 = hashlib.sha1()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(block)
+    return {
+        "path": os.path.abspath(file),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha1": sha1.hexdigest(),
+    }
+
+
+def _is_fresh(source, file):
+    try:
+        stat = os.stat(file)
+    except OSError:
+        return False
+    if stat.st_size != source["size"]:
+        return False
+    if stat.st_mtime_ns == source["mtime_ns"]:
+        return True
+    # Touched but maybe not modified.
+    return _fingerprint(file)["sha1"] == source["sha1"]
+
+
+def _align(n, alignment=8):
+    return (n + alignment - 1) // alignment * alignment
+
+
+def compile_corpus(files, output):
+    """Compiles text files of tokenized segments into a binary cache.
+
+    Args:
+        files: list of paths of parallel files, one segment per line. A translation
+            file is compiled alone and the reference files of a test set together.
+        output: path of the binary cache to write.
+
+    Raises:
+        ValueError: when the files do not have the same number of lines.
+    """
+    files = list(files)
+    vocab = Vocabulary()
+    tokens = array.array(ID_TYPECODE)
+    offsets = []
+    for file in files:
+        table = array.array(OFFSET_TYPECODE, [len(tokens)])
+        with open(file) as f:
+            for line in f:
+                tokens.extend(vocab.encode(line.split()))
+                table.append(len(tokens))
+        if offsets and len(table) != len(offsets[0]):
+            raise ValueError(
+                "%s has %d lines, but %s has %d"
+                % (file, len(table) - 1, files[0], len(offsets[0]) - 1)
+            )
+        offsets.append(table)
+
+    header = json.dumps(
+        {
+            "sources": [_fingerprint(file) for file in files],
+            "vocab": vocab.tokens(),
+            "n_segments": len(offsets[0]) - 1 if offsets else 0,
+            "n_tokens": len(tokens),
+            "byteorder": sys.byteorder,
+        }
+    ).encode("utf-8")
+    # Written aside and renamed, so that a reader never sees a partial cache.
+    fd, temp = tempfile.mkstemp(
+        prefix=os.path.basename(output) + ".", dir=os.path.dirname(os.path.abspath(output))
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            for table in offsets:
+                table.tofile(f)
+            tokens.tofile(f)
+        os.replace(temp, output)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+class BinaryCorpus(object):
+    """A binary cache opened with mmap.
+
+    Attributes:
+        vocab: the list of tokens, the token of id i being at index i - 1.
+        sources: the fingerprints of the files the cache was compiled from.
+        tokens: memoryview of the flat array of token ids.
+        offsets: list of memoryviews of the offset table of every file.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _PREAMBLE.size:
+                raise ValueError("%s is not a binary corpus of version %d" % (path, VERSION))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = _PREAMBLE.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("%s is not a binary corpus of version %d" % (path, VERSION))
+        start = _PREAMBLE.size
+        try:
+            header = json.loads(self._mmap[start : start + header_length].decode("utf-8"))
+            byteorder = header["byteorder"]
+            self.sources = header["sources"]
+            self.vocab = header["vocab"]
+            self.n_segments = header["n_segments"]
+            n_tokens = header["n_tokens"]
+        except (ValueError, KeyError, TypeError):
+            self.close()
+            raise ValueError("%s has a corrupt header" % path)
+        if byteorder != sys.byteorder:
+            self.close()
+            raise ValueError("%s was compiled on a machine of another byte order" % path)
+
+        position = _align(start + header_length)
+        table_size = (self.n_segments + 1) * array.array(OFFSET_TYPECODE).itemsize
+        token_size = n_tokens * array.array(ID_TYPECODE).itemsize
+        if len(self._mmap) < position + len(self.sources) * table_size + token_size:
+            self.close()
+            raise ValueError("%s is truncated" % path)
+        view = memoryview(self._mmap)
+        self.offsets = []
+        for _ in self.sources:
+            self.offsets.append(view[position : position + table_size].cast(OFFSET_TYPECODE))
+            position += table_size
+        self.tokens = view[position : position + token_size].cast(ID_TYPECODE)
+        self._views = [view, self.tokens] + self.offsets
+
+    def __len__(self):
+        return self.n_segments
+
+    @property
+    def n_files(self):
+        return len(self.sources)
+
+    def segment(self, i, file=0):
+        """Returns the token ids of the i-th segment of a file, without copy."""
+        offsets = self.offsets[file]
+        return self.tokens[offsets[i] : offsets[i + 1]]
+
+    def tokenize(self, i, file=0):
+        """Returns the i-th segment of a file as a list of tokens."""
+        vocab = self.vocab
+        return [vocab[id - 1] for id in self.segment(i, file)]
+
+    def is_fresh(self):
+        """Tells whether none of the source files has changed since compilation."""
+        return all(_is_fresh(source, source["path"]) for source in self.sources)
+
+    def close(self):
+        for view in reversed(getattr(self, "_views", [])):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_corpus(path):
+    """Opens a binary cache written by compile_corpus()."""
+    return BinaryCorpus(path)
+
+
+def cached_corpus(files, path):
+    """Opens the binary cache of some files, compiling it first if missing or stale.
+
+    A cache that cannot be read, being corrupt or of another version, is recompiled.
+    """
+    files = [os.path.abspath(file) for file in files]
+    if os.path.exists(path):
+        try:
+            corpus = BinaryCorpus(path)
+        except ValueError:
+            corpus = None
+        if corpus is not None:
+            if [source["path"] for source in corpus.sources] == files and corpus.is_fresh():
+                return corpus
+            corpus.close()
+    compile_corpus(files, path)
+    return BinaryCorpus(path)
+
+
+def _iter_statistics(translations, references, max_order):
+    if references.vocab is translations.vocab:
+        # Already encoded with the same ids, e.g. by bleu.loader.load_encoded_corpus().
+        remap = None
+    else:
+        # Encode the reference tokens into the translation ids, so only the small
+        # vocabulary is translated and the token arrays are read in place.
+        vocab = Vocabulary(translations.vocab)
+        remap = array.array(ID_TYPECODE, [0])
+        remap.extend(vocab.add(token) for token in references.vocab)
+    for i in range(len(translations)):
+        if remap is None:
+            references_ids = [
+                references.segment(i, file) for file in range(references.n_files)
+            ]
+        else:
+            references_ids = [
+                [remap[id] for id in references.segment(i, file)]
+                for file in range(references.n_files)
+            ]
+        yield segment_statistics(
+            translations.segment(i),
+            merge_reference_codes(references_ids, max_order),
+            min(map(len, references_ids)),
+            max_order,
+        )
+
+
+def binary_statistics(translations, references, max_order=None):
+    """Computes the sufficient statistics of a translation cache against a reference cache.
+
+    Args:
+        translations: BinaryCorpus of a translation file.
+        references: BinaryCorpus of the reference files.
+        max_order: Maximum n-gram order to collect statistics for.
+
+    Returns:
+        The same array as bleu.metrics.bleu_statistics() on the text files.
+    """
+    if len(translations) != len(references):
+        raise ValueError(
+            "The translations have %d segments but the references have %d"
+            % (len(translations), len(references))
+        )
+    max_order = max_order or DEFAULT_MAX_ORDER
+    stats = array.array(STATISTICS_TYPECODE)
+    for row in _iter_statistics(translations, references, max_order):
+        stats.extend(row)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile text files into a binary cache.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("-o", dest="output", required=True)
+    args = parser.parse_args()
+    compile_corpus(args.files, args.output)
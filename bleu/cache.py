@@ -0,0 +1,224 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Persistent cache of per-segment sufficient statistics.
+
+The statistics of a segment only depend on its translation, its references and the
+max order, so they are stored under the SHA-1 of those. When an evaluation is run
+again, only the segments whose translation or references changed are scored, and
+the rows of all the others are read from the cache.
+
+The cache is a SQLite database holding one row of 32-bit counts per segment. It is
+bounded in size: when it grows past max_bytes, the least recently used rows are
+evicted.
+"""
+
+import array
+import hashlib
+import sqlite3
+
+from bleu.metrics import (
+    DEFAULT_MAX_ORDER,
+    STATISTICS_TYPECODE,
+    bleu_statistics,
+    check_corpus_lengths,
+    statistics_width,
+)
+
+__all__ = [
+    "StatisticsCache",
+    "cached_statistics",
+]
+
+# Typecode of the rows stored in the cache. The counts of a segment fit in 32 bits.
+CACHE_TYPECODE = "I"
+
+# Size of a key, a SHA-1 digest.
+KEY_SIZE = 20
+
+# Number of keys looked up in one query, below the SQLite limit on variables.
+_QUERY_SIZE = 500
+
+
+def segment_key(translation, references, max_order):
+    """Returns the cache key of a segment, given as lists of tokens."""
+    text = "%d\n%s\n%s" % (
+        max_order,
+        " ".join(translation),
+        "\n".join(" ".join(reference) for reference in references),
+    )
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class StatisticsCache(object):
+    """Size-bounded LRU cache of rows of statistics, stored in a SQLite file.
+
+    Args:
+        path: the database file, created if missing.
+        max_bytes: the maximum size of the keys and rows held. None for no bound.
+    """
+
+    def __init__(self, path, max_bytes=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(str(path))
+        # A lost write only costs a rescoring, so durability is traded for speed.
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS stats (
+                key BLOB PRIMARY KEY,
+                row BLOB NOT NULL,
+                used INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            """
+        )
+        # Every lookup or insertion is stamped with the next tick, for the LRU order.
+        (tick,) = self.connection.execute("SELECT MAX(used) FROM stats").fetchone()
+        self.tick = (tick or 0) + 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM stats").fetchone()[0]
+
+    def size(self):
+        """Returns the number of bytes of the keys and rows held."""
+        (size,) = self.connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(row)), 0) + ? * COUNT(*) FROM stats", (KEY_SIZE,)
+        ).fetchone()
+        return size
+
+    def get_many(self, keys):
+        """Returns a dict of the rows, as lists, found of some keys, marking them as used."""
+        keys = list(keys)
+        found = {}
+        with self.connection:
+            for start in range(0, len(keys), _QUERY_SIZE):
+                chunk = keys[start : start + _QUERY_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = self.connection.execute(
+                    "SELECT key, row FROM stats WHERE key IN (%s)" % placeholders, chunk
+                )
+                for key, row in cursor:
+                    values = array.array(CACHE_TYPECODE)
+                    values.frombytes(row)
+                    found[key] = values.tolist()
+                self.connection.execute(
+                    "UPDATE stats SET used = ? WHERE key IN (%s)" % placeholders,
+                    [self.tick] + chunk,
+                )
+        self.tick += 1
+        return found
+
+    def put_many(self, items):
+        """Stores (key, row) pairs, then evicts the least recently used rows if needed."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO stats (key, row, used) VALUES (?, ?, ?)",
+                (
+                    (key, array.array(CACHE_TYPECODE, row).tobytes(), self.tick)
+                    for key, row in items
+                ),
+            )
+        self.tick += 1
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used rows until the cache fits in max_bytes."""
+        if self.max_bytes is None:
+            return
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        # Rows are deleted oldest first, KEY_SIZE + len(row) bytes at a time.
+        cursor = self.connection.execute(
+            "SELECT key, LENGTH(row) FROM stats ORDER BY used"
+        )
+        evicted = []
+        for key, length in cursor:
+            evicted.append((key,))
+            excess -= KEY_SIZE + length
+            if excess <= 0:
+                break
+        with self.connection:
+            self.connection.executemany("DELETE FROM stats WHERE key = ?", evicted)
+
+    def close(self):
+        self.connection.close()
+
+
+def cached_statistics(
+    translation_corpus,
+    reference_corpus,
+    cache,
+    max_order=None,
+    engine=None,
+    workers=None,
+    chunksize=None,
+):
+    """Same as bleu_statistics(), but only scores the segments missing from a cache.
+
+    Args:
+        cache: a StatisticsCache, updated with the rows of the segments scored.
+        The other arguments are those of bleu_statistics(), which scores the
+        missing segments.
+
+    Returns:
+        The same array as bleu_statistics().
+    """
+    check_corpus_lengths(translation_corpus, reference_corpus)
+    max_order = max_order or DEFAULT_MAX_ORDER
+    keys = [
+        segment_key(translation, references, max_order)
+        for translation, references in zip(translation_corpus, reference_corpus)
+    ]
+    found = cache.get_many(set(keys))
+
+    missing = {}
+    for i, key in enumerate(keys):
+        if key not in found and key not in missing:
+            missing[key] = i
+    if missing:
+        indices = list(missing.values())
+        new_stats = bleu_statistics(
+            [translation_corpus[i] for i in indices],
+            [reference_corpus[i] for i in indices],
+            max_order,
+            engine,
+            workers,
+            chunksize,
+        )
+        width = statistics_width(max_order)
+        new_rows = [new_stats[j * width : (j + 1) * width] for j in range(len(indices))]
+        cache.put_many(zip(missing, new_rows))
+        found.update(zip(missing, new_rows))
+
+    stats = array.array(STATISTICS_TYPECODE)
+    for key in keys:
+        stats.extend(found[key])
+    return stats
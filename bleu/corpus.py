@@ -0,0 +1,384 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Compact, deduplicated in-memory corpora.
+
+A corpus loaded as nested lists holds a str object per token occurrence and a list
+per line. The corpora here hold every distinct token once in a vocabulary, and
+every distinct line once as an array of 4-byte token ids, so identical reference
+lines, frequent on multi-reference test sets, cost a single copy.
+
+They are sequences of light __slots__ views over that storage, with the shape of
+the nested lists: a CompactCorpus is a sequence of Segment, and a
+CompactReferenceCorpus a sequence of References, each a sequence of Segment. They
+can be passed wherever a translation_corpus or reference_corpus is expected::
+
+    translations = CompactCorpus.from_file("trans.txt")
+    references = CompactReferenceCorpus.from_files(["r1.txt", "r2.txt"])
+    score = bleu_corpus_level(translations, references)
+
+To also extract the n-grams of every distinct reference line only once, and share
+the merged n-gram table of identical sets of references, score against
+references.index(max_order) instead.
+"""
+
+import array
+import collections.abc
+import contextlib
+import itertools
+
+from bleu.integer import ID_TYPECODE, Vocabulary, get_ngram_codes
+from bleu.metrics import (
+    DEFAULT_ENGINE,
+    DEFAULT_MAX_ORDER,
+    ReferenceIndex,
+    _get_ngrams,
+)
+from bleu.utils import iter_stripped_lines
+
+__all__ = [
+    "Segment",
+    "References",
+    "CompactCorpus",
+    "CompactReferenceCorpus",
+]
+
+OFFSET_TYPECODE = "q"
+
+
+class _LineStore(object):
+    """Interns tokens and lines. The tables used to intern are dropped by freeze()."""
+
+    def __init__(self):
+        self.vocab = []
+        self.tokens = array.array(ID_TYPECODE)
+        self.offsets = array.array(OFFSET_TYPECODE, [0])
+        self._token_ids = {}
+        self._line_ids = {}
+
+    def add(self, segment):
+        """Interns a list of tokens, returning the id of its line."""
+        token_ids = self._token_ids
+        try:
+            ids = array.array(ID_TYPECODE, [token_ids[token] for token in segment])
+        except KeyError:
+            for token in segment:
+                if token not in token_ids:
+                    self.vocab.append(token)
+                    token_ids[token] = len(self.vocab)
+            ids = array.array(ID_TYPECODE, [token_ids[token] for token in segment])
+        key = ids.tobytes()
+        line = self._line_ids.get(key)
+        if line is None:
+            line = self._line_ids[key] = len(self.offsets) - 1
+            self.tokens.extend(ids)
+            self.offsets.append(len(self.tokens))
+        return line
+
+    def freeze(self):
+        del self._token_ids, self._line_ids
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def ids(self, line):
+        """Returns the array of token ids of a line."""
+        return self.tokens[self.offsets[line] : self.offsets[line + 1]]
+
+
+class Segment(collections.abc.Sequence):
+    """A read-only view of a line as a sequence of tokens."""
+
+    __slots__ = ("_store", "_line")
+
+    def __init__(self, store, line):
+        self._store = store
+        self._line = line
+
+    def __len__(self):
+        offsets = self._store.offsets
+        return offsets[self._line + 1] - offsets[self._line]
+
+    def __getitem__(self, i):
+        store = self._store
+        start = store.offsets[self._line]
+        stop = store.offsets[self._line + 1]
+        vocab = store.vocab
+        if isinstance(i, slice):
+            # Only the ids of the slice are read, not those of the whole line.
+            first, last, step = i.indices(stop - start)
+            if step == 1:
+                ids = store.tokens[start + first : start + max(first, last)]
+            else:
+                ids = [store.tokens[start + j] for j in range(first, last, step)]
+            return [vocab[id - 1] for id in ids]
+        if i < 0:
+            i += stop - start
+        if not 0 <= i < stop - start:
+            raise IndexError("segment index out of range")
+        return vocab[store.tokens[start + i] - 1]
+
+    def __iter__(self):
+        vocab = self._store.vocab
+        return (vocab[id - 1] for id in self.ids)
+
+    @property
+    def ids(self):
+        """The array of token ids of the segment in the vocabulary of its corpus."""
+        return self._store.ids(self._line)
+
+    def __eq__(self, other):
+        if isinstance(other, Segment) and other._store is self._store:
+            return other._line == self._line
+        if isinstance(other, (Segment, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "Segment(%r)" % list(self)
+
+
+class CompactCorpus(collections.abc.Sequence):
+    """A translation corpus as a sequence of Segment.
+
+    Attributes:
+        vocab: the list of distinct tokens, the token of id i being at index i - 1.
+    """
+
+    def __init__(self, store, lines):
+        self._store = store
+        self._lines = lines
+
+    @classmethod
+    def from_corpus(cls, translation_corpus):
+        """Builds a CompactCorpus from a list of lists of tokens."""
+        store = _LineStore()
+        lines = array.array(ID_TYPECODE, [store.add(segment) for segment in translation_corpus])
+        store.freeze()
+        return cls(store, lines)
+
+    @classmethod
+    def from_file(cls, file):
+        """Same as load_translation_corpus(), without a list per line."""
+        with open(file) as f:
+            return cls.from_corpus(line.split() for line in f)
+
+    @property
+    def vocab(self):
+        return self._store.vocab
+
+    @property
+    def n_distinct(self):
+        """The number of distinct lines actually stored."""
+        return len(self._store)
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return CompactCorpus(self._store, self._lines[i])
+        return Segment(self._store, self._lines[i])
+
+
+class References(collections.abc.Sequence):
+    """A read-only view of the references of a segment, as a sequence of Segment."""
+
+    __slots__ = ("_corpus", "_segment")
+
+    def __init__(self, corpus, segment):
+        self._corpus = corpus
+        self._segment = segment
+
+    def _range(self):
+        offsets = self._corpus._offsets
+        return offsets[self._segment], offsets[self._segment + 1]
+
+    def __len__(self):
+        start, stop = self._range()
+        return stop - start
+
+    def __getitem__(self, i):
+        start, stop = self._range()
+        lines = self._corpus._lines[start:stop]
+        store = self._corpus._store
+        if isinstance(i, slice):
+            return [Segment(store, line) for line in lines[i]]
+        return Segment(store, lines[i])
+
+    @property
+    def lines(self):
+        """The ids of the distinct lines of the references."""
+        start, stop = self._range()
+        return self._corpus._lines[start:stop]
+
+    def __repr__(self):
+        return "References(%r)" % list(self)
+
+
+class CompactReferenceCorpus(collections.abc.Sequence):
+    """A reference corpus as a sequence of References.
+
+    Attributes:
+        vocab: the list of distinct tokens, the token of id i being at index i - 1.
+    """
+
+    def __init__(self, store, lines, offsets):
+        self._store = store
+        self._lines = lines
+        self._offsets = offsets
+
+    @classmethod
+    def from_corpus(cls, reference_corpus):
+        """Builds a CompactReferenceCorpus from a list of lists of references."""
+        store = _LineStore()
+        lines = array.array(ID_TYPECODE)
+        offsets = array.array(OFFSET_TYPECODE, [0])
+        for references in reference_corpus:
+            lines.extend([store.add(reference) for reference in references])
+            offsets.append(len(lines))
+        store.freeze()
+        return cls(store, lines, offsets)
+
+    @classmethod
+    def from_files(cls, files):
+        """Same as load_reference_corpus(), reading the files line by line.
+
+        Raises:
+            ValueError: when a file does not have the same number of lines as the
+                first one.
+        """
+        files = list(files)
+        with contextlib.ExitStack() as stack:
+            all_lines = [iter_stripped_lines(stack.enter_context(open(file))) for file in files]
+            reference_corpus = _zip_files(files, all_lines)
+            return cls.from_corpus(reference_corpus)
+
+    @property
+    def vocab(self):
+        return self._store.vocab
+
+    @property
+    def n_distinct(self):
+        """The number of distinct lines actually stored."""
+        return len(self._store)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("corpus index out of range")
+        return References(self, i)
+
+    def index(self, max_order=None, engine=None):
+        """Builds a ReferenceIndex extracting the n-grams of every distinct line once.
+
+        Segments with the same set of reference lines share one merged table.
+
+        Args:
+            max_order: the maximum order of the n-grams of the index.
+            engine: "counter" or "integer".
+
+        Returns:
+            A ReferenceIndex, giving the same scores as this corpus.
+        """
+        max_order = max_order or DEFAULT_MAX_ORDER
+        engine = engine or DEFAULT_ENGINE
+        index = ReferenceIndex([], max_order, engine)
+        if engine == "integer":
+            # The ids of the Vocabulary are those of the store.
+            index.vocab = Vocabulary(self._store.vocab)
+
+            def get_table(line):
+                return get_ngram_codes(self._store.ids(line), max_order)
+
+            merge = _max_merge_codes
+        else:
+
+            def get_table(line):
+                return _get_ngrams(list(Segment(self._store, line)), max_order)
+
+            merge = _max_merge_counter
+
+        line_tables = {}
+        merged_tables = {}
+        for segment in range(len(self)):
+            lines = self[segment].lines
+            key = tuple(sorted(set(lines)))
+            merged = merged_tables.get(key)
+            if merged is None:
+                tables = []
+                for line in key:
+                    if line not in line_tables:
+                        line_tables[line] = get_table(line)
+                    tables.append(line_tables[line])
+                merged = merged_tables[key] = merge(tables)
+            index.ngram_counts.append(merged)
+            offsets = self._store.offsets
+            index.reference_lengths.append(
+                min(offsets[line + 1] - offsets[line] for line in lines)
+            )
+        return index
+
+
+def _max_merge_counter(tables):
+    if len(tables) == 1:
+        return tables[0]
+    merged = collections.Counter()
+    for table in tables:
+        merged |= table
+    return merged
+
+
+def _max_merge_codes(tables):
+    if len(tables) == 1:
+        return tables[0]
+    merged = [collections.Counter(counts) for counts in tables[0]]
+    for table in tables[1:]:
+        for merged_counts, counts in zip(merged, table):
+            get = merged_counts.get
+            for code, count in counts.items():
+                if count > get(code, 0):
+                    merged_counts[code] = count
+    return merged
+
+
+def _zip_files(files, all_lines):
+    for lineno, lines in enumerate(itertools.zip_longest(*all_lines), 1):
+        if None in lines:
+            ended = [str(file) for file, line in zip(files, lines) if line is None]
+            raise ValueError(
+                "%s ended at line %d, before the other files"
+                % (", ".join(ended), lineno - 1)
+            )
+        yield [line.split() for line in lines]
@@ -0,0 +1,170 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Integer-encoded n-gram engine.
+
+Tokens are interned to integer ids once per corpus, and an n-gram is packed into
+a single int by reading its ids as the digits of a number in base ID_BASE. Since
+no id is zero, every n-gram of every order gets a distinct code, and the codes of
+order n + 1 are computed from those of order n with one multiply-add. This avoids
+building a tuple per n-gram and lets Counter() count the codes in C.
+
+The statistics produced are exactly those of the Counter-of-tuples engine.
+"""
+
+import array
+import collections
+
+__all__ = [
+    "Vocabulary",
+]
+
+# Every id must be in [1, ID_BASE).
+ID_BASE = 1 << 32
+
+ID_TYPECODE = "I"
+
+# Id of the tokens missing from a frozen vocabulary. No interned token gets it, so
+# the codes of the n-grams holding it match no reference n-gram.
+UNKNOWN_ID = ID_BASE - 1
+
+
+class Vocabulary(object):
+    """Interns tokens to integer ids starting from 1."""
+
+    def __init__(self, tokens=()):
+        self.ids = {}
+        for token in tokens:
+            self.add(token)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, token):
+        return token in self.ids
+
+    def add(self, token):
+        try:
+            return self.ids[token]
+        except KeyError:
+            id = self.ids[token] = len(self.ids) + 1
+            return id
+
+    def encode(self, segment):
+        """Turns a list of tokens into an array of ids, adding unseen tokens."""
+        ids = self.ids
+        try:
+            return array.array(ID_TYPECODE, [ids[token] for token in segment])
+        except KeyError:
+            return array.array(ID_TYPECODE, [self.add(token) for token in segment])
+
+    def lookup(self, segment):
+        """Same as encode(), but maps unseen tokens to UNKNOWN_ID instead of adding them.
+
+        This keeps a long-lived vocabulary from growing with every translation.
+        """
+        get = self.ids.get
+        return array.array(ID_TYPECODE, [get(token, UNKNOWN_ID) for token in segment])
+
+    def tokens(self):
+        """Returns the list of tokens where the token of id i is at i - 1."""
+        return sorted(self.ids, key=self.ids.get)
+
+
+def get_ngram_codes(ids, max_order):
+    """Counts the packed n-gram codes of a segment of ids.
+
+    Returns:
+        A list of max_order Counters, the i-th holding the codes of order i + 1.
+    """
+    ngram_counts = []
+    codes = list(ids)
+    for order in range(1, max_order + 1):
+        ngram_counts.append(collections.Counter(codes))
+        codes = [
+            code * ID_BASE + next_id for code, next_id in zip(codes, ids[order:])
+        ]
+    return ngram_counts
+
+
+def merge_reference_codes(references_ids, max_order):
+    """Computes the max reference count of every code among all references."""
+    merged = None
+    for ids in references_ids:
+        ngram_counts = get_ngram_codes(ids, max_order)
+        if merged is None:
+            merged = ngram_counts
+            continue
+        # Same as the | operator of Counter, but without building a new Counter.
+        for merged_counts, counts in zip(merged, ngram_counts):
+            get = merged_counts.get
+            for code, count in counts.items():
+                if count > get(code, 0):
+                    merged_counts[code] = count
+    return merged
+
+
+def segment_statistics(ids, merged_ref_codes, reference_length, max_order):
+    """Computes the row of sufficient statistics of a single encoded translation.
+
+    See bleu.metrics.statistics_width() for the layout of a row.
+    """
+    row = [0] * (2 + 2 * max_order)
+    row[0] = len(ids)
+    row[1] = reference_length
+    for order, counts in enumerate(get_ngram_codes(ids, max_order)):
+        get = merged_ref_codes[order].get
+        # Clipping: each code matches at most its max reference count.
+        matches = 0
+        for code, count in counts.items():
+            ref_count = get(code)
+            if ref_count:
+                matches += count if count < ref_count else ref_count
+        row[2 + order] = matches
+        row[2 + max_order + order] = max(len(ids) - order, 0)
+    return row
+
+
+def iter_statistics(translation_corpus, reference_corpus, max_order):
+    """Yields the row of sufficient statistics of each translation in turn."""
+    vocab = Vocabulary()
+    for (references, translation) in zip(reference_corpus, translation_corpus):
+        yield segment_statistics(
+            vocab.encode(translation),
+            merge_reference_codes(map(vocab.encode, references), max_order),
+            min(len(r) for r in references),
+            max_order,
+        )
+
+
+def iter_indexed_statistics(translation_corpus, vocab, ngram_codes, reference_lengths, max_order):
+    """Yields the statistics of each translation against precompiled reference codes.
+
+    The vocabulary is only looked up, so that it does not grow with the tokens of
+    every corpus scored against the same references.
+    """
+    for (translation, merged_ref_codes, reference_length) in zip(
+        translation_corpus, ngram_codes, reference_lengths
+    ):
+        yield segment_statistics(
+            vocab.lookup(translation), merged_ref_codes, reference_length, max_order
+        )
@@ -0,0 +1,218 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Fast loader of parallel text files into token ids.
+
+load_reference_corpus() holds the whole text of every file, its list of lines and
+a list of tokens per line before anything is scored. This loader instead maps
+every file in memory and scans it once: the lines are cut out of the mapping as
+bytes and split into byte tokens, which are interned into integer ids without
+being decoded. Only the tokens of the vocabulary are decoded, once each.
+
+The files are tokenized concurrently by a pool of processes, and the result is an
+EncodedFiles, which has the interface of a bleu.binary.BinaryCorpus, so that it
+can be scored with bleu.binary.binary_statistics() directly::
+
+    translations, references = load_encoded_corpus("trans.txt", ["r1.txt", "r2.txt"])
+    stats = binary_statistics(translations, references, max_order=4)
+
+Lines end with "\\n", "\\r\\n" or "\\r" as in text mode, and are split the way
+str.split() splits them, so the tokens are exactly those of load_translation_corpus().
+"""
+
+import array
+import concurrent.futures
+import mmap
+import os
+import re
+
+from bleu.binary import OFFSET_TYPECODE
+from bleu.integer import ID_TYPECODE
+
+__all__ = [
+    "EncodedFiles",
+    "load_encoded_files",
+    "load_encoded_corpus",
+]
+
+# Bytes on which bytes.split() and str.split() may disagree: the non-ASCII ones,
+# and the ASCII separators that str.split() takes for whitespace.
+_NOT_BYTE_SPLITTABLE = re.compile(rb"[\x1c-\x1f\x80-\xff]")
+
+
+class EncodedFiles(object):
+    """Parallel files held as token ids, with the interface of a BinaryCorpus.
+
+    Attributes:
+        vocab: the list of tokens, the token of id i being at index i - 1.
+        files: the paths of the files.
+        tokens: the flat array of token ids of all the files.
+        offsets: list of the arrays of segment offsets into tokens of every file.
+    """
+
+    def __init__(self, vocab, files, tokens, offsets):
+        self.vocab = vocab
+        self.files = files
+        self.tokens = tokens
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets[0]) - 1 if self.offsets else 0
+
+    @property
+    def n_files(self):
+        return len(self.offsets)
+
+    def segment(self, i, file=0):
+        """Returns the token ids of the i-th segment of a file."""
+        offsets = self.offsets[file]
+        return self.tokens[offsets[i] : offsets[i + 1]]
+
+    def tokenize(self, i, file=0):
+        """Returns the i-th segment of a file as a list of tokens."""
+        vocab = self.vocab
+        return [vocab[id - 1] for id in self.segment(i, file)]
+
+    def select(self, files):
+        """Returns the EncodedFiles of some of the files, sharing the token array."""
+        return EncodedFiles(
+            self.vocab,
+            [self.files[file] for file in files],
+            self.tokens,
+            [self.offsets[file] for file in files],
+        )
+
+
+def _iter_lines(data):
+    if data.find(b"\r") >= 0:
+        # Universal newlines, rare enough to afford a copy of the data.
+        yield from data[:].splitlines()
+        return
+    start = 0
+    find = data.find
+    end = find(b"\n")
+    while end >= 0:
+        yield data[start:end]
+        start = end + 1
+        end = find(b"\n", start)
+    if start < len(data):
+        yield data[start:]
+
+
+def _tokenize_file(file):
+    """Interns the tokens of a file into ids of its own vocabulary.
+
+    Returns:
+        A (vocab, tokens, offsets) tuple, the vocab being the list of byte tokens of
+        ids 1, 2, ... or of str tokens if the file can not be split as bytes.
+    """
+    ids = {}
+    tokens = array.array(ID_TYPECODE)
+    offsets = array.array(OFFSET_TYPECODE, [0])
+    with open(file, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # An empty file can not be mapped.
+            data = b""
+        try:
+            byte_splittable = _NOT_BYTE_SPLITTABLE.search(data) is None
+            for line in _iter_lines(data):
+                if not byte_splittable:
+                    line = line.decode("utf-8")
+                segment = line.split()
+                try:
+                    tokens.extend([ids[token] for token in segment])
+                except KeyError:
+                    for token in segment:
+                        if token not in ids:
+                            ids[token] = len(ids) + 1
+                    tokens.extend([ids[token] for token in segment])
+                offsets.append(len(tokens))
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+    return list(ids), tokens, offsets
+
+
+def _merge_files(files, results):
+    """Remaps the ids of every file into one shared vocabulary."""
+    vocab = {}
+    tokens = array.array(ID_TYPECODE)
+    all_offsets = []
+    for file, (file_vocab, file_tokens, offsets) in zip(files, results):
+        if len(offsets) != len(all_offsets[0] if all_offsets else offsets):
+            raise ValueError(
+                "%s has %d lines, but %s has %d"
+                % (file, len(offsets) - 1, files[0], len(all_offsets[0]) - 1)
+            )
+        # The ids of the first file are kept as they are.
+        identity = not vocab
+        remap = array.array(ID_TYPECODE, [0])
+        for token in file_vocab:
+            if isinstance(token, bytes):
+                token = token.decode("utf-8")
+            remap.append(vocab.setdefault(token, len(vocab) + 1))
+        shift = len(tokens)
+        if identity:
+            tokens.extend(file_tokens)
+        else:
+            tokens.extend([remap[id] for id in file_tokens])
+        if shift:
+            offsets = array.array(OFFSET_TYPECODE, [offset + shift for offset in offsets])
+        all_offsets.append(offsets)
+    return EncodedFiles(list(vocab), list(files), tokens, all_offsets)
+
+
+def load_encoded_files(files, workers=None):
+    """Loads parallel text files into token ids sharing one vocabulary.
+
+    Args:
+        files: list of paths of files of the same number of lines.
+        workers: number of processes to tokenize the files with. Default to one
+            process per file, up to the number of CPUs. 1 tokenizes the files in
+            this process.
+
+    Returns:
+        An EncodedFiles of the files.
+
+    Raises:
+        ValueError: when a file does not have the same number of lines as the
+            first one. The message names both files.
+    """
+    files = list(files)
+    if workers == 1 or len(files) < 2:
+        results = map(_tokenize_file, files)
+        return _merge_files(files, results)
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        return _merge_files(files, executor.map(_tokenize_file, files))
+
+
+def load_encoded_corpus(translation_file, reference_files, workers=None):
+    """Loads a translation file and its reference files into token ids.
+
+    Returns:
+        An (translations, references) pair of EncodedFiles, sharing their vocabulary
+        and token array, ready for bleu.binary.binary_statistics().
+    """
+    encoded = load_encoded_files([translation_file] + list(reference_files), workers)
+    return encoded.select([0]), encoded.select(range(1, encoded.n_files))
@@ -21,14 +21,33 @@ Chin-Yew Lin, Franz Josef Och. ORANGE: a method for evaluating automatic
 evaluation metrics for machine translation. COLING 2004.
 """
 
+import array
 import collections
+import itertools
 import math
+import time
 
 __all__ = [
     "compute_bleu",
     "bleu_corpus_level",
     "bleu_sentence_level",
+    "bleu_statistics",
+    "bleu_from_statistics",
+    "sentence_scores_from_statistics",
+    "sum_statistics",
+    "statistics_width",
+    "truncate_statistics",
+    "truncate_statistics_row",
+    "iter_statistics_rows",
+    "check_corpus_lengths",
+    "bleu_corpus_level_multi",
+    "bleu_sentence_level_multi",
+    "bleu_corpus_level_iter",
+    "iter_bleu_statistics",
+    "BleuAccumulator",
+    "bleu_sentence_level_batch",
     "BleuScore",
+    "ReferenceIndex",
 ]
 
 # Hold the result of bleu_corpus_level().
@@ -38,6 +57,9 @@ BleuScore = collections.namedtuple(
 
 DEFAULT_MAX_ORDER = 4
 
+# Typecode of the array holding sufficient statistics (signed 64-bit).
+STATISTICS_TYPECODE = "q"
+
 
 def _get_ngrams(segment, max_order):
     """Extracts all n-grams up to a given maximum order from an input segment.
@@ -50,6 +72,9 @@ def _get_ngrams(segment, max_order):
         The Counter containing all n-grams upto max_order in segment
         with a count of how many times each n-gram occurred.
     """
+    if not isinstance(segment, list):
+        # Sequences such as bleu.corpus.Segment are sliced much faster as a list.
+        segment = list(segment)
     ngram_counts = collections.Counter()
     for order in range(1, max_order + 1):
         for i in range(0, len(segment) - order + 1):
@@ -59,81 +84,383 @@ def _get_ngrams(segment, max_order):
     return ngram_counts
 
 
-def bleu_sentence_level(
-    translation_sentence, reference_corpus, max_order=None, smooth=False
+def _merge_reference_ngrams(references, max_order):
+    """Computes the max reference count of every n-gram among all references."""
+    merged_ref_ngram_counts = collections.Counter()
+    for reference in references:
+        # The | operator computes the maximum reference count as in the original paper.
+        # In fact, for any instance of n-grams, we takes its max count among all references.
+        # For example, ref1 is "the", ref2 is "the the", we are using n=1 (unigram),
+        # then the max reference count for "the" will be 2.
+        merged_ref_ngram_counts |= _get_ngrams(reference, max_order)
+    return merged_ref_ngram_counts
+
+
+def check_corpus_lengths(translation_corpus, reference_corpus):
+    """Raises ValueError unless both corpora have as many segments."""
+    if len(translation_corpus) != len(reference_corpus):
+        raise ValueError(
+            """
+        You passed a translation_corpus of len %d and a reference_corpus of len %d.
+        Their lens don't match.
+        Perhaps some of them is not a *corpus*?
+        """
+            % (len(translation_corpus), len(reference_corpus))
+        )
+
+
+def statistics_width(max_order):
+    """Returns the number of statistics kept for one segment.
+
+    A row of statistics is laid out as::
+
+        [translation_length, reference_length,
+         matches_1, ..., matches_n, possible_matches_1, ..., possible_matches_n]
+    """
+    return 2 + 2 * max_order
+
+
+def _clipped_statistics(
+    translation_length,
+    translation_ngram_counts,
+    merged_ref_ngram_counts,
+    reference_length,
+    max_order,
 ):
-    return bleu_corpus_level(
-        [translation_sentence], [reference_corpus], max_order, smooth
+    """Computes the row of sufficient statistics from the n-grams of a translation."""
+    row = [0] * statistics_width(max_order)
+    row[0] = translation_length
+    row[1] = reference_length
+
+    # The & operator does the clipping as in the original paper.
+    # It ensures that the counts in overlap does not exceed that in the merged counts.
+    # The clipping prevents meaningless translation consisting of many repeated words being overestimated,
+    # like "the the the..." against "the cat sat on the mat".
+    overlap = translation_ngram_counts & merged_ref_ngram_counts
+    for ngram, count in overlap.items():
+        row[1 + len(ngram)] += count
+
+    # Compute normalizer or dividend of the precisions.
+    # This computes the counts of all n-grams ranging from 1 to max_order in a translation.
+    # This term serves as the normalizer or dividend of the modified-ngrams-precision.
+    for order in range(1, max_order + 1):
+        possible_matches = translation_length - order + 1
+        if possible_matches > 0:
+            row[1 + max_order + order] = possible_matches
+    return row
+
+
+def _segment_statistics(translation, merged_ref_ngram_counts, reference_length, max_order):
+    """Computes the row of sufficient statistics of a single translation."""
+    return _clipped_statistics(
+        len(translation),
+        _get_ngrams(translation, max_order),
+        merged_ref_ngram_counts,
+        reference_length,
+        max_order,
     )
 
 
-def bleu_corpus_level(
-    translation_corpus, reference_corpus, max_order=None, smooth=False
+def _iter_profiled_statistics(translation_corpus, reference_corpus, max_order, profiler):
+    """Same as the Counter engine, but times the n-gram extraction and the clipping apart.
+
+    The measures are summed here and reported to the profiler once, at the end.
+    """
+    clock = time.perf_counter
+    ngram_seconds = clipping_seconds = 0.0
+    n_segments = n_ngrams = 0
+    try:
+        for (references, translation) in zip(reference_corpus, translation_corpus):
+            start = clock()
+            merged_ref_ngram_counts = _merge_reference_ngrams(references, max_order)
+            translation_ngram_counts = _get_ngrams(translation, max_order)
+            extracted = clock()
+            row = _clipped_statistics(
+                len(translation),
+                translation_ngram_counts,
+                merged_ref_ngram_counts,
+                min(len(r) for r in references),
+                max_order,
+            )
+            ngram_seconds += extracted - start
+            clipping_seconds += clock() - extracted
+            n_segments += 1
+            n_ngrams += sum(row[2 + max_order :])
+            yield row
+    finally:
+        profiler.add_time("ngrams", ngram_seconds)
+        profiler.add_time("clipping", clipping_seconds)
+        profiler.count("segments", n_segments)
+        profiler.count("ngrams", n_ngrams)
+
+
+ENGINES = ("counter", "integer", "numpy")
+
+DEFAULT_ENGINE = "counter"
+
+
+def _check_engine(engine):
+    if engine not in ENGINES:
+        raise ValueError("engine must be one of %r, got %r" % (ENGINES, engine))
+
+
+class ReferenceIndex(object):
+    """Precompiled reference corpus that can score any number of translation corpora.
+
+    The merged n-gram counts and the reference length of every segment are computed
+    once at construction. A ReferenceIndex can be passed wherever a reference_corpus
+    is expected, as long as the max_order requested does not exceed its own.
+    The engine used to score against the index is the one it was built with.
+    """
+
+    def __init__(self, reference_corpus, max_order=None, engine=None):
+        self.max_order = max_order or DEFAULT_MAX_ORDER
+        self.engine = engine or DEFAULT_ENGINE
+        if self.engine not in ("counter", "integer"):
+            raise ValueError("ReferenceIndex does not support engine %r" % self.engine)
+        self.vocab = None
+        self.ngram_counts = []
+        self.reference_lengths = array.array(STATISTICS_TYPECODE)
+        for references in reference_corpus:
+            self.ngram_counts.append(self._merge(references))
+            self.reference_lengths.append(min(len(r) for r in references))
+
+    def _merge(self, references):
+        if self.engine == "integer":
+            from bleu.integer import Vocabulary, merge_reference_codes
+
+            if self.vocab is None:
+                self.vocab = Vocabulary()
+            return merge_reference_codes(map(self.vocab.encode, references), self.max_order)
+        return _merge_reference_ngrams(references, self.max_order)
+
+    def __len__(self):
+        return len(self.ngram_counts)
+
+    def slice(self, start, stop):
+        """Returns a ReferenceIndex of the segments in [start, stop), sharing the tables."""
+        index = ReferenceIndex.__new__(ReferenceIndex)
+        index.max_order = self.max_order
+        index.engine = self.engine
+        index.vocab = self.vocab
+        index.ngram_counts = self.ngram_counts[start:stop]
+        index.reference_lengths = self.reference_lengths[start:stop]
+        return index
+
+    def check_order(self, max_order):
+        if max_order > self.max_order:
+            raise ValueError(
+                "This ReferenceIndex holds n-grams up to order %d, but order %d is requested"
+                % (self.max_order, max_order)
+            )
+
+
+def _statistics_matrix(translation_corpus, reference_corpus, max_order):
+    from bleu.vectorized import corpus_statistics, encode_corpus
+
+    return corpus_statistics(encode_corpus(translation_corpus, reference_corpus), max_order)
+
+
+def _uses_numpy(reference_corpus, engine):
+    return engine == "numpy" and not isinstance(reference_corpus, ReferenceIndex)
+
+
+def _profiled_statistics_matrix(translation_corpus, reference_corpus, max_order, profiler):
+    if profiler is None:
+        return _statistics_matrix(translation_corpus, reference_corpus, max_order)
+    with profiler.stage("statistics"):
+        matrix = _statistics_matrix(translation_corpus, reference_corpus, max_order)
+    profiler.count("segments", len(matrix))
+    profiler.count("ngrams", int(matrix[:, 2 + max_order :].sum()))
+    return matrix
+
+
+def _corpus_totals(translation_corpus, reference_corpus, max_order, engine, profiler=None):
+    """Computes the sum of the statistics of all translations."""
+    if _uses_numpy(reference_corpus, engine):
+        matrix = _profiled_statistics_matrix(
+            translation_corpus, reference_corpus, max_order, profiler
+        )
+        return matrix.sum(axis=0).tolist()
+    totals = [0] * statistics_width(max_order)
+    for row in _iter_statistics(
+        translation_corpus, reference_corpus, max_order, engine, profiler
+    ):
+        for i, value in enumerate(row):
+            totals[i] += value
+    return totals
+
+
+def _iter_statistics(
+    translation_corpus, reference_corpus, max_order, engine=None, profiler=None
 ):
-    """Computes BLEU score of translated segments against one or more references.
+    """Yields the row of sufficient statistics of each translation in turn."""
+    if profiler is None:
+        return _iter_engine_statistics(
+            translation_corpus, reference_corpus, max_order, engine
+        )
+    if (engine or DEFAULT_ENGINE) == "counter" and not isinstance(
+        reference_corpus, ReferenceIndex
+    ):
+        return _iter_profiled_statistics(
+            translation_corpus, reference_corpus, max_order, profiler
+        )
+    from bleu.profiling import profile_rows
+
+    return profile_rows(
+        _iter_engine_statistics(translation_corpus, reference_corpus, max_order, engine),
+        profiler,
+        "statistics",
+        max_order,
+    )
+
+
+def _iter_engine_statistics(translation_corpus, reference_corpus, max_order, engine):
+    if isinstance(reference_corpus, ReferenceIndex):
+        if engine is not None and engine != reference_corpus.engine:
+            raise ValueError(
+                "This ReferenceIndex was built for engine %r, not %r"
+                % (reference_corpus.engine, engine)
+            )
+        reference_corpus.check_order(max_order)
+        if reference_corpus.engine == "integer":
+            from bleu.integer import iter_indexed_statistics
+
+            return iter_indexed_statistics(
+                translation_corpus,
+                reference_corpus.vocab,
+                reference_corpus.ngram_counts,
+                reference_corpus.reference_lengths,
+                max_order,
+            )
+        return (
+            _segment_statistics(
+                translation, merged_ref_ngram_counts, reference_length, max_order
+            )
+            for (translation, merged_ref_ngram_counts, reference_length) in zip(
+                translation_corpus,
+                reference_corpus.ngram_counts,
+                reference_corpus.reference_lengths,
+            )
+        )
+
+    engine = engine or DEFAULT_ENGINE
+    _check_engine(engine)
+    if engine == "integer":
+        from bleu.integer import iter_statistics
+
+        return iter_statistics(translation_corpus, reference_corpus, max_order)
+    if engine == "numpy":
+        return iter(
+            _statistics_matrix(translation_corpus, reference_corpus, max_order).tolist()
+        )
+    return (
+        _segment_statistics(
+            translation,
+            _merge_reference_ngrams(references, max_order),
+            min(len(r) for r in references),
+            max_order,
+        )
+        for (references, translation) in zip(reference_corpus, translation_corpus)
+    )
+
+
+def bleu_statistics(
+    translation_corpus,
+    reference_corpus,
+    max_order=None,
+    engine=None,
+    workers=None,
+    chunksize=None,
+    profiler=None,
+):
+    """Computes the sufficient statistics of every translation in a corpus.
+
+    All BLEU scores, sentence or corpus level, are functions of a handful of
+    counts per segment. Computing those counts once lets the caller derive
+    sentence scores and the corpus score without touching the tokens again.
 
     Args:
-        reference_corpus: list of lists of references for each translation. Each
-            reference should be tokenized into a list of tokens.
-            Note: This is a nested list of references. Each translation can have one or more references.
-        translation_corpus: list of translations to score. Each translation
-            should be tokenized into a list of tokens.
-        max_order: Maximum n-gram order to use when computing BLEU score.
-        smooth: Whether or not to apply Lin et al. 2004 smoothing.
+        translation_corpus: list of translations, as in bleu_corpus_level().
+        reference_corpus: list of lists of references, as in bleu_corpus_level().
+        max_order: Maximum n-gram order to collect statistics for.
+        engine: how n-grams are extracted and clipped, one of ENGINES.
+            Every engine gives the same statistics.
+        workers: if greater than 1, the number of processes to score the corpus
+            with. See bleu.parallel.
+        chunksize: number of segments a worker process scores at a time.
+        profiler: a bleu.profiling.Profiler to record the stages with.
 
     Returns:
-        4-Tuple with the BLEU score, geometric mean, n-gram precisions and brevity penalty.
+        A flat array of ints holding one row of statistics_width(max_order)
+        numbers per translation. See statistics_width() for the layout of a row.
     """
+    check_corpus_lengths(translation_corpus, reference_corpus)
+    max_order = max_order or DEFAULT_MAX_ORDER
+    if workers is not None and workers > 1:
+        from bleu.parallel import parallel_statistics
 
-    # The use of & and | operators of Counter to implement
-    # max_ref_count and clipped_by_max_ref_count, which underlies the modified n-grams count,
-    # is a very smart idea.
-
-    if len(translation_corpus) != len(reference_corpus):
-        raise ValueError(
-            """
-        You passed a translation_corpus of len %d and a reference_corpus of len %d.
-        Their lens don't match.
-        Perhaps some of them is not a *corpus*?
-        """
-            % (len(translation_corpus), len(reference_corpus))
+        if profiler is None:
+            return parallel_statistics(
+                translation_corpus, reference_corpus, max_order, engine, workers, chunksize
+            )
+        with profiler.stage("statistics"):
+            stats = parallel_statistics(
+                translation_corpus, reference_corpus, max_order, engine, workers, chunksize
+            )
+        profiler.count("segments", len(translation_corpus))
+        profiler.count("ngrams", sum(sum_statistics(stats, max_order)[2 + max_order :]))
+        return stats
+    stats = array.array(STATISTICS_TYPECODE)
+    if _uses_numpy(reference_corpus, engine):
+        matrix = _profiled_statistics_matrix(
+            translation_corpus, reference_corpus, max_order, profiler
         )
+        stats.frombytes(matrix.tobytes())
+        return stats
+    for row in _iter_statistics(
+        translation_corpus, reference_corpus, max_order, engine, profiler
+    ):
+        stats.extend(row)
+    return stats
+
+
+def iter_statistics_rows(stats, max_order):
+    """Yields every row of an array of statistics of max_order, without copy."""
+    width = statistics_width(max_order)
+    for start in range(0, len(stats), width):
+        yield stats[start : start + width]
+
+
+def sum_statistics(stats, max_order=None):
+    """Sums the rows of statistics returned by bleu_statistics() into one row.
 
+    The summed row is the sufficient statistics of the whole corpus.
+    """
     max_order = max_order or DEFAULT_MAX_ORDER
-    matches_by_order = [0] * max_order
-    possible_matches_by_order = [0] * max_order
-    reference_length = 0
-    translation_length = 0
-    for (references, translation) in zip(reference_corpus, translation_corpus):
-        reference_length += min(len(r) for r in references)
-        translation_length += len(translation)
-
-        merged_ref_ngram_counts = collections.Counter()
-        for reference in references:
-            # The | operator computes the maximum reference count as in the original paper.
-            # In fact, for any instance of n-grams, we takes its max count among all references.
-            # For example, ref1 is "the", ref2 is "the the", we are using n=1 (unigram),
-            # then the max reference count for "the" will be 2.
-            merged_ref_ngram_counts |= _get_ngrams(reference, max_order)
-        translation_ngram_counts = _get_ngrams(translation, max_order)
-
-        # The & operator does the clipping as in the original paper.
-        # It ensures that the counts in overlap does not exceed that in the merged counts.
-        # The clipping prevents meaningless translation consisting of many repeated words being overestimated,
-        # like "the the the..." against "the cat sat on the mat".
-        overlap = translation_ngram_counts & merged_ref_ngram_counts
-        for ngram in overlap:
-            matches_by_order[len(ngram) - 1] += overlap[ngram]
-
-        # Compute normalizer or dividend of the precisions.
-        # This computes the counts of all n-grams ranging from 1 to max_order in a translation,
-        # stored in `possible_matches_by_order[i]`.
-        # This term serves as the normalizer or dividend of the modified-ngrams-precision.
-        # The for loop below defines a simple function, see test_ngram_count.py for its behaviours.
-        for order in range(1, max_order + 1):
-            possible_matches = len(translation) - order + 1
-            if possible_matches > 0:
-                possible_matches_by_order[order - 1] += possible_matches
+    totals = [0] * statistics_width(max_order)
+    for row in iter_statistics_rows(stats, max_order):
+        for i, value in enumerate(row):
+            totals[i] += value
+    return totals
+
+
+def bleu_from_statistics(row, smooth=False):
+    """Computes BLEU score from a single row of sufficient statistics.
+
+    Args:
+        row: statistics of a segment, or the sum of them over a corpus.
+            The max_order is implied by the length of the row.
+        smooth: Whether or not to apply Lin et al. 2004 smoothing.
+
+    Returns:
+        4-Tuple with the BLEU score, geometric mean, n-gram precisions and brevity penalty.
+    """
+    max_order = (len(row) - 2) // 2
+    translation_length = row[0]
+    reference_length = row[1]
+    matches_by_order = row[2 : 2 + max_order]
+    possible_matches_by_order = row[2 + max_order :]
 
     # Compute the modified n-grams precision.
     precisions = [0] * max_order
@@ -172,5 +499,460 @@ def bleu_corpus_level(
     )
 
 
+def sentence_scores_from_statistics(stats, max_order=None, smooth=False):
+    """Computes the sentence level BLEU of every row returned by bleu_statistics().
+
+    Returns:
+        A list of BleuScore, one for each translation.
+    """
+    max_order = max_order or DEFAULT_MAX_ORDER
+    return [
+        bleu_from_statistics(row, smooth) for row in iter_statistics_rows(stats, max_order)
+    ]
+
+
+def truncate_statistics_row(row, max_order, order):
+    """Same as truncate_statistics() on a single row, but without checking order."""
+    return list(row[: 2 + order]) + list(row[2 + max_order : 2 + max_order + order])
+
+
+def truncate_statistics(stats, max_order, order):
+    """Derives the statistics of a lower order from those of max_order.
+
+    The counts of an order do not depend on the max_order they were collected with,
+    so the statistics of every order up to max_order come from a single extraction.
+    """
+    if not 1 <= order <= max_order:
+        raise ValueError(
+            "order must be within [1, %d], got %d" % (max_order, order)
+        )
+    truncated = array.array(STATISTICS_TYPECODE)
+    for row in iter_statistics_rows(stats, max_order):
+        truncated.extend(truncate_statistics_row(row, max_order, order))
+    return truncated
+
+
+def _scores_for_orders(row, orders, smooths):
+    max_order = (len(row) - 2) // 2
+    return {
+        (order, smooth): bleu_from_statistics(
+            truncate_statistics_row(row, max_order, order), smooth
+        )
+        for order in orders
+        for smooth in smooths
+    }
+
+
+def bleu_corpus_level_multi(
+    translation_corpus, reference_corpus, orders=None, smooths=(False, True), engine=None
+):
+    """Computes corpus level BLEU for several orders and smoothing settings at once.
+
+    The n-grams are extracted and clipped only once, up to the largest order.
+
+    Args:
+        translation_corpus: list of translations, as in bleu_corpus_level().
+        reference_corpus: list of lists of references, as in bleu_corpus_level().
+        orders: the max_order values to compute BLEU for. Default to 1 to DEFAULT_MAX_ORDER.
+        smooths: the smooth values to compute BLEU for.
+        engine: how n-grams are extracted and clipped, one of ENGINES.
+
+    Returns:
+        A dict mapping each (order, smooth) pair to a BleuScore.
+    """
+    orders = list(orders or range(1, DEFAULT_MAX_ORDER + 1))
+    check_corpus_lengths(translation_corpus, reference_corpus)
+    totals = _corpus_totals(translation_corpus, reference_corpus, max(orders), engine)
+    return _scores_for_orders(totals, orders, smooths)
+
+
+def bleu_sentence_level_multi(
+    translation_sentence, reference_corpus, orders=None, smooths=(False, True), engine=None
+):
+    return bleu_corpus_level_multi(
+        [translation_sentence], [reference_corpus], orders, smooths, engine
+    )
+
+
+def iter_bleu_statistics(segments, max_order=None, engine=None, profiler=None):
+    """Computes the sufficient statistics of a stream of translations lazily.
+
+    Args:
+        segments: an iterable of (translation, references) pairs, such as that of
+            bleu.utils.iter_corpus().
+        max_order: Maximum n-gram order to collect statistics for.
+        engine: "counter" or "integer". The "numpy" engine needs the whole corpus.
+        profiler: a bleu.profiling.Profiler to record the stages with.
+
+    Yields:
+        The row of statistics of each translation, as a list.
+    """
+    max_order = max_order or DEFAULT_MAX_ORDER
+    engine = engine or DEFAULT_ENGINE
+    if engine == "numpy":
+        raise ValueError("the numpy engine cannot score a stream of segments")
+    # The two sides are consumed in lockstep, so tee() only buffers one pair.
+    translation_side, reference_side = itertools.tee(segments)
+    return _iter_statistics(
+        (translation for translation, _ in translation_side),
+        (references for _, references in reference_side),
+        max_order,
+        engine,
+        profiler,
+    )
+
+
+def bleu_corpus_level_iter(
+    segments, max_order=None, smooth=False, engine=None, profiler=None
+):
+    """Computes corpus level BLEU of a stream of translations in constant memory.
+
+    Only the running totals of the statistics are kept, so the corpus can be read
+    from files as it is scored.
+
+    Args:
+        segments: an iterable of (translation, references) pairs, such as that of
+            bleu.utils.iter_corpus().
+        max_order: Maximum n-gram order to use when computing BLEU score.
+        smooth: Whether or not to apply Lin et al. 2004 smoothing.
+        engine: "counter" or "integer".
+        profiler: a bleu.profiling.Profiler to record the stages with.
+
+    Returns:
+        The same BleuScore as bleu_corpus_level() on the materialized corpus.
+    """
+    max_order = max_order or DEFAULT_MAX_ORDER
+    totals = [0] * statistics_width(max_order)
+    for row in iter_bleu_statistics(segments, max_order, engine, profiler):
+        for i, value in enumerate(row):
+            totals[i] += value
+    return bleu_from_statistics(totals, smooth)
+
+
+class BleuAccumulator(object):
+    """Keeps the statistics of a corpus that grows, shrinks or changes over time.
+
+    Every segment is stored as its row of sufficient statistics under a segment id,
+    and the totals are updated as segments come and go, so score() costs O(max_order)
+    however many segments are in the corpus. Accumulators fed by different workers
+    can be merged exactly: the ids assigned by add() are renumbered by merge() when
+    taken, while the ids passed explicitly must not overlap, such as the index of the
+    segment in the dataset when the work is shared.
+
+    An accumulator can be pickled, or turned into a JSON-compatible dict with to_dict().
+    """
+
+    def __init__(self, max_order=None, smooth=False, engine=None):
+        self.max_order = max_order or DEFAULT_MAX_ORDER
+        self.smooth = smooth
+        self.engine = engine
+        self.totals = [0] * statistics_width(self.max_order)
+        self.rows = {}
+        self._next_id = 0
+        # The ids assigned by add(), which merge() may renumber.
+        self._auto_ids = set()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, segment_id):
+        return segment_id in self.rows
+
+    def _update_totals(self, row, sign):
+        for i, value in enumerate(row):
+            self.totals[i] += sign * value
+
+    def _add_row(self, segment_id, row):
+        if segment_id in self.rows:
+            raise ValueError("Segment %r is already in the accumulator" % (segment_id,))
+        self.rows[segment_id] = row
+        self._update_totals(row, 1)
+
+    def _row(self, translation, references):
+        row = next(
+            _iter_statistics([translation], [references], self.max_order, self.engine)
+        )
+        return list(row)
+
+    def add(self, translation, references, segment_id=None):
+        """Adds a translation and its references.
+
+        Args:
+            translation: list of tokens.
+            references: list of references, each a list of tokens.
+            segment_id: a hashable id of the segment. Default to the next integer.
+
+        Returns:
+            The id of the segment.
+        """
+        row = self._row(translation, references)
+        if segment_id is None:
+            segment_id = self._new_id()
+            self._auto_ids.add(segment_id)
+        self._add_row(segment_id, row)
+        return segment_id
+
+    def _new_id(self):
+        while self._next_id in self.rows:
+            self._next_id += 1
+        return self._next_id
+
+    def remove(self, segment_id):
+        """Removes a segment. Raises KeyError if it is not in the accumulator."""
+        self._update_totals(self.rows.pop(segment_id), -1)
+        self._auto_ids.discard(segment_id)
+
+    def replace(self, segment_id, translation, references):
+        """Replaces the translation and references of a segment.
+
+        The segment is left as it was if the new one cannot be scored.
+        """
+        if segment_id not in self.rows:
+            raise KeyError(segment_id)
+        row = self._row(translation, references)
+        self.remove(segment_id)
+        self._add_row(segment_id, row)
+
+    def merge(self, other):
+        """Adds all the segments of another accumulator into this one.
+
+        The segments whose id was assigned by the add() of the other accumulator get
+        a new id when theirs is taken. Raises ValueError if an id passed explicitly
+        to the other accumulator is in this one.
+        """
+        if other.max_order != self.max_order:
+            raise ValueError(
+                "Cannot merge an accumulator of max_order %d into one of %d"
+                % (other.max_order, self.max_order)
+            )
+        overlap = (self.rows.keys() & other.rows.keys()) - other._auto_ids
+        if overlap:
+            raise ValueError("Both accumulators have segments %r" % sorted(overlap, key=repr))
+        auto_rows = []
+        for segment_id, row in other.rows.items():
+            if segment_id in other._auto_ids:
+                auto_rows.append((segment_id, row))
+            else:
+                self._add_row(segment_id, list(row))
+        for segment_id, row in auto_rows:
+            if segment_id in self.rows:
+                segment_id = self._new_id()
+            self._auto_ids.add(segment_id)
+            self._add_row(segment_id, list(row))
+
+    def score(self):
+        """Computes the corpus level BLEU of the current segments, 0 when there is none."""
+        if not self.rows:
+            return BleuScore(
+                bleu=0.0,
+                geo_mean=0.0,
+                precisions=[0.0] * self.max_order,
+                brevity_penalty=0.0,
+            )
+        return bleu_from_statistics(self.totals, self.smooth)
+
+    def statistics(self):
+        """Returns the statistics of the current segments as bleu_statistics() would."""
+        stats = array.array(STATISTICS_TYPECODE)
+        for row in self.rows.values():
+            stats.extend(row)
+        return stats
+
+    def to_dict(self):
+        """Returns the state as a JSON-compatible dict."""
+        return {
+            "max_order": self.max_order,
+            "smooth": self.smooth,
+            "engine": self.engine,
+            "segments": [[segment_id, row] for segment_id, row in self.rows.items()],
+            "auto_ids": sorted(self._auto_ids),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Restores an accumulator from the result of to_dict().
+
+        JSON turns tuples into lists, so list segment ids are restored as tuples.
+        """
+        accumulator = cls(state["max_order"], state["smooth"], state["engine"])
+        for segment_id, row in state["segments"]:
+            accumulator._add_row(_segment_id(segment_id), row)
+        accumulator._auto_ids.update(state.get("auto_ids", ()))
+        return accumulator
+
+
+def _segment_id(segment_id):
+    if isinstance(segment_id, list):
+        return tuple(_segment_id(item) for item in segment_id)
+    return segment_id
+
+
+def bleu_sentence_level_batch(
+    translation_sentences,
+    reference_corpus,
+    source_ids=None,
+    max_order=None,
+    smooth=False,
+    full=False,
+):
+    """Computes sentence level BLEU of a batch of translations, e.g. as RL rewards.
+
+    Several translations can be samples of the same source, in which case they share
+    the references of that source, whose n-grams are extracted only once. Without
+    NumPy, n-grams are packed into ints as in the "integer" engine.
+
+    Args:
+        translation_sentences: list of translations, each a list of tokens.
+        reference_corpus: list of lists of references, one list per source.
+        source_ids: source_ids[i] is the index in reference_corpus of the references
+            of the i-th translation. Default to translation i using references i.
+        max_order: Maximum n-gram order to use when computing BLEU score.
+        smooth: Whether or not to apply Lin et al. 2004 smoothing.
+        full: Whether to return the full BleuScore of every translation.
+
+    Returns:
+        An array of floats holding the BLEU score of every translation, or a list of
+        BleuScore if full is true. An empty translation scores 0. When NumPy is
+        installed, the batch is scored in bulk by bleu.vectorized, whose results may
+        differ from bleu_sentence_level() in the last bits.
+    """
+    if source_ids is None:
+        check_corpus_lengths(translation_sentences, reference_corpus)
+        source_ids = range(len(translation_sentences))
+    elif len(source_ids) != len(translation_sentences):
+        raise ValueError(
+            "You passed %d translations but %d source_ids"
+            % (len(translation_sentences), len(source_ids))
+        )
+    max_order = max_order or DEFAULT_MAX_ORDER
+    try:
+        from bleu.vectorized import batch_statistics, bleu_from_statistics_array
+    except ImportError:  # NumPy is not installed.
+        return _sentence_level_batch_python(
+            translation_sentences, reference_corpus, source_ids, max_order, smooth, full
+        )
+
+    # The whole batch is counted and scored in bulk, the references of every source
+    # being counted once.
+    stats = batch_statistics(translation_sentences, reference_corpus, source_ids, max_order)
+    scores = bleu_from_statistics_array(stats, smooth)
+    if not full:
+        return array.array("d", scores.bleu.tolist())
+    return [
+        BleuScore(bleu=bleu, geo_mean=geo_mean, precisions=precisions, brevity_penalty=bp)
+        for bleu, geo_mean, precisions, bp in zip(
+            scores.bleu.tolist(),
+            scores.geo_mean.tolist(),
+            scores.precisions.tolist(),
+            scores.brevity_penalty.tolist(),
+        )
+    ]
+
+
+def _sentence_level_batch_python(
+    translation_sentences, reference_corpus, source_ids, max_order, smooth, full
+):
+    from bleu.integer import Vocabulary, merge_reference_codes, segment_statistics
+
+    vocab = Vocabulary()
+    references_cache = {}
+    scores = [] if full else array.array("d")
+    for translation, source_id in zip(translation_sentences, source_ids):
+        try:
+            merged_ref_codes, reference_length = references_cache[source_id]
+        except KeyError:
+            references = reference_corpus[source_id]
+            merged_ref_codes = merge_reference_codes(map(vocab.encode, references), max_order)
+            reference_length = min(len(r) for r in references)
+            references_cache[source_id] = merged_ref_codes, reference_length
+        row = segment_statistics(
+            vocab.encode(translation), merged_ref_codes, reference_length, max_order
+        )
+        if row[0] == 0:
+            # The brevity penalty of an empty translation divides by zero. Its
+            # precisions are scored on their own, and its penalty taken as 0.
+            score = bleu_from_statistics([1, 1] + row[2:], smooth)._replace(
+                bleu=0.0, brevity_penalty=0.0
+            )
+        else:
+            score = bleu_from_statistics(row, smooth)
+        scores.append(score if full else score.bleu)
+    return scores
+
+
+def bleu_sentence_level(
+    translation_sentence, reference_corpus, max_order=None, smooth=False, engine=None
+):
+    return bleu_corpus_level(
+        [translation_sentence], [reference_corpus], max_order, smooth, engine
+    )
+
+
+def bleu_corpus_level(
+    translation_corpus,
+    reference_corpus,
+    max_order=None,
+    smooth=False,
+    engine=None,
+    workers=None,
+    chunksize=None,
+    profiler=None,
+):
+    """Computes BLEU score of translated segments against one or more references.
+
+    Args:
+        reference_corpus: list of lists of references for each translation. Each
+            reference should be tokenized into a list of tokens.
+            Note: This is a nested list of references. Each translation can have one or more references.
+            A ReferenceIndex built from such a list is also accepted.
+        translation_corpus: list of translations to score. Each translation
+            should be tokenized into a list of tokens.
+        max_order: Maximum n-gram order to use when computing BLEU score.
+        smooth: Whether or not to apply Lin et al. 2004 smoothing.
+        engine: how n-grams are extracted and clipped, one of ENGINES.
+            "counter" uses Counters of token tuples, "integer" packs n-grams
+            of interned token ids into ints, and "numpy" counts them in bulk
+            with NumPy (see bleu.vectorized). All give the same score.
+        workers: if greater than 1, the corpus is cut into chunks of chunksize
+            segments which are scored in that many processes. The result is the
+            same as that of the serial path.
+        chunksize: number of segments a worker process scores at a time.
+        profiler: a bleu.profiling.Profiler to record the time spent in n-gram
+            extraction, clipping and scoring, and the amount of work done.
+
+    Returns:
+        4-Tuple with the BLEU score, geometric mean, n-gram precisions and brevity penalty.
+    """
+
+    # The use of & and | operators of Counter to implement
+    # max_ref_count and clipped_by_max_ref_count, which underlies the modified n-grams count,
+    # is a very smart idea.
+
+    check_corpus_lengths(translation_corpus, reference_corpus)
+    max_order = max_order or DEFAULT_MAX_ORDER
+    if workers is not None and workers > 1:
+        from bleu.parallel import parallel_totals
+
+        if profiler is None:
+            totals = parallel_totals(
+                translation_corpus, reference_corpus, max_order, engine, workers, chunksize
+            )
+        else:
+            with profiler.stage("statistics"):
+                totals = parallel_totals(
+                    translation_corpus, reference_corpus, max_order, engine, workers, chunksize
+                )
+            profiler.count("segments", len(translation_corpus))
+            profiler.count("ngrams", sum(totals[2 + max_order :]))
+    else:
+        totals = _corpus_totals(
+            translation_corpus, reference_corpus, max_order, engine, profiler
+        )
+    if profiler is None:
+        return bleu_from_statistics(totals, smooth)
+    with profiler.stage("scoring"):
+        return bleu_from_statistics(totals, smooth)
+
+
 # Compatible
 compute_bleu = bleu_corpus_level
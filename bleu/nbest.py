@@ -0,0 +1,177 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Pairwise BLEU of n-best lists, for reranking and MBR decoding.
+
+The n-grams of every candidate and reference are extracted once. The clipped
+matches of all (candidate, reference) pairs are then computed together with
+matrix products, using that for counts a and b::
+
+    min(a, b) = sum(t = 1, 2, ...) [a >= t] * [b >= t]
+
+so summing over the n-grams gives one product of 0/1 matrices per count level.
+When candidates are used as their own pseudo-references, the same matrix serves
+as both operands.
+
+NumPy is required by this module.
+"""
+
+import numpy as np
+
+from bleu.integer import Vocabulary, get_ngram_codes
+from bleu.metrics import DEFAULT_MAX_ORDER, statistics_width
+from bleu.vectorized import bleu_from_statistics_array
+
+__all__ = [
+    "nbest_statistics",
+    "nbest_bleu_matrix",
+]
+
+# Number of n-gram columns made dense and multiplied at a time, to bound memory.
+_COLUMN_BLOCK = 8192
+
+
+def _count_table(ngram_counts, order, columns):
+    """Flattens the codes of one order of many segments into (rows, columns, counts).
+
+    columns maps every code to a column number, and is extended with unseen codes.
+    """
+    rows, codes, counts = [], [], []
+    for row, segment_counts in enumerate(ngram_counts):
+        table = segment_counts[order]
+        rows.extend([row] * len(table))
+        codes.extend([columns.setdefault(code, len(columns)) for code in table])
+        counts.extend(table.values())
+    return (
+        np.array(rows, dtype=np.int64),
+        np.array(codes, dtype=np.int64),
+        np.array(counts, dtype=np.int64),
+    )
+
+
+def _dense(rows, columns, counts, n_rows, n_columns):
+    matrix = np.zeros((n_rows, n_columns), dtype=np.int64)
+    matrix[rows, columns] = counts
+    return matrix
+
+
+def _shared_entries(table, shared):
+    """Keeps the entries of a count table on shared codes, sorted by column in shared."""
+    rows, codes, counts = table
+    keep = np.isin(codes, shared)
+    columns = np.searchsorted(shared, codes[keep])
+    order = np.argsort(columns, kind="stable")
+    return rows[keep][order], columns[order], counts[keep][order]
+
+
+def _dense_block(entries, start, stop, n_rows):
+    """Builds the dense counts of the columns in [start, stop) of sorted entries."""
+    rows, columns, counts = entries
+    lo, hi = np.searchsorted(columns, [start, stop])
+    return _dense(rows[lo:hi], columns[lo:hi] - start, counts[lo:hi], n_rows, stop - start)
+
+
+def _clipped_matches(hyp_table, ref_table, n_hyps, n_refs, same):
+    """Computes sum over n-grams of min(hyp count, ref count) for all pairs."""
+    # Only n-grams found on both sides can match.
+    shared = np.intersect1d(hyp_table[1], ref_table[1])
+    matches = np.zeros((n_hyps, n_refs), dtype=np.float32)
+    if not len(shared):
+        return matches
+    hyp_entries = _shared_entries(hyp_table, shared)
+    ref_entries = hyp_entries if same else _shared_entries(ref_table, shared)
+    for start in range(0, len(shared), _COLUMN_BLOCK):
+        stop = min(start + _COLUMN_BLOCK, len(shared))
+        hyp_block = _dense_block(hyp_entries, start, stop, n_hyps)
+        ref_block = hyp_block if same else _dense_block(ref_entries, start, stop, n_refs)
+        level = 1
+        while True:
+            # Columns where both sides reach this count.
+            columns = (hyp_block.max(axis=0) >= level) & (ref_block.max(axis=0) >= level)
+            if not columns.any():
+                break
+            # Exact in float32, as matches never come near 2 ** 24.
+            hyp_level = (hyp_block[:, columns] >= level).astype(np.float32)
+            ref_level = (ref_block[:, columns] >= level).astype(np.float32)
+            matches += hyp_level @ ref_level.T
+            level += 1
+    return matches
+
+
+def nbest_statistics(candidates, references=None, max_order=None):
+    """Computes the sufficient statistics of every candidate against every reference.
+
+    Args:
+        candidates: list of candidate translations, each a list of tokens.
+        references: list of references, each a list of tokens. Default to the
+            candidates themselves, used as pseudo-references.
+        max_order: Maximum n-gram order to collect statistics for.
+
+    Returns:
+        An int64 array of shape (n_candidates, n_references, statistics_width(max_order)).
+        Entry [i, j] is the row of statistics of candidate i scored against
+        reference j alone.
+    """
+    max_order = max_order or DEFAULT_MAX_ORDER
+    same = references is None
+    vocab = Vocabulary()
+    hyp_ngrams = [get_ngram_codes(vocab.encode(c), max_order) for c in candidates]
+    ref_ngrams = (
+        hyp_ngrams
+        if same
+        else [get_ngram_codes(vocab.encode(r), max_order) for r in references]
+    )
+    references = candidates if same else references
+    n_hyps, n_refs = len(candidates), len(references)
+
+    stats = np.zeros((n_hyps, n_refs, statistics_width(max_order)), dtype=np.int64)
+    hyp_lengths = np.array([len(c) for c in candidates], dtype=np.int64)
+    stats[:, :, 0] = hyp_lengths[:, None]
+    stats[:, :, 1] = np.array([len(r) for r in references], dtype=np.int64)[None, :]
+    for order in range(max_order):
+        columns = {}
+        hyp_table = _count_table(hyp_ngrams, order, columns)
+        ref_table = hyp_table if same else _count_table(ref_ngrams, order, columns)
+        stats[:, :, 2 + order] = np.rint(
+            _clipped_matches(hyp_table, ref_table, n_hyps, n_refs, same)
+        ).astype(np.int64)
+        stats[:, :, 2 + max_order + order] = np.maximum(hyp_lengths - order, 0)[:, None]
+    return stats
+
+
+def nbest_bleu_matrix(candidates, references=None, max_order=None, smooth=False):
+    """Computes the sentence level BLEU of every candidate against every reference.
+
+    Args:
+        candidates: list of candidate translations, each a list of tokens.
+        references: list of references, each a list of tokens. Default to the
+            candidates themselves, as in MBR decoding.
+        max_order: Maximum n-gram order to use when computing BLEU score.
+        smooth: Whether or not to apply Lin et al. 2004 smoothing.
+
+    Returns:
+        A float array of shape (n_candidates, n_references).
+    """
+    stats = nbest_statistics(candidates, references, max_order)
+    n_hyps, n_refs, width = stats.shape
+    scores = bleu_from_statistics_array(stats.reshape(-1, width), smooth)
+    return scores.bleu.reshape(n_hyps, n_refs)
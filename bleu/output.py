@@ -0,0 +1,190 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Streaming writers of sentence level scores.
+
+Writing the scores of millions of segments as one JSON document needs all of them
+in memory first. These writers instead append the scores to a file as they come,
+in bulk writes of a buffer of fixed size, so memory stays flat:
+
+- "jsonl": one JSON value per line, a float or a list of floats.
+- "npy": a NumPy array of float32, one row per segment, that can be read back
+  without parsing with numpy.load(path, mmap_mode="r"). NumPy is not needed to
+  write it.
+"""
+
+import array
+import json
+import struct
+import sys
+
+__all__ = [
+    "SCORE_FORMATS",
+    "JsonLinesWriter",
+    "NpyWriter",
+    "open_score_writer",
+    "write_scores",
+]
+
+SCORE_FORMATS = ("jsonl", "npy")
+
+# Number of scores written to the file at a time.
+DEFAULT_BUFFER_SIZE = 1 << 16
+
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+# Size of the .npy header, fixed so that it can be rewritten in place once the
+# number of rows is known. It is a multiple of 64 as the format recommends.
+NPY_HEADER_SIZE = 128
+
+
+class JsonLinesWriter(object):
+    """Writes one score per line as JSON.
+
+    Args:
+        path: the file to write.
+        buffer_size: number of scores buffered before a write.
+    """
+
+    def __init__(self, path, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.file = open(path, "w")
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, score):
+        self.buffer.append(json.dumps(score))
+        self.count += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.buffer.append("")
+            self.file.write("\n".join(self.buffer))
+            self.buffer = []
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def _npy_header(shape):
+    # array("f") holds floats in the byte order of the machine.
+    descr = ("<" if sys.byteorder == "little" else ">") + "f4"
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': %r, }" % (descr, shape)
+    size = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2
+    if len(header) + 1 > size:
+        raise ValueError("Too many scores for a .npy header of %d bytes" % NPY_HEADER_SIZE)
+    return NPY_MAGIC + struct.pack("<H", size) + header.ljust(size - 1).encode("ascii") + b"\n"
+
+
+class NpyWriter(object):
+    """Writes scores as the rows of a float32 .npy file.
+
+    The header is written with a placeholder shape first, then rewritten with the
+    number of rows when the writer is closed.
+
+    Args:
+        path: the file to write.
+        columns: the number of floats of every score, or None if every score is a
+            single float, making a 1-D array.
+        buffer_size: number of scores buffered before a write.
+    """
+
+    def __init__(self, path, columns=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.file = open(path, "wb")
+        self.columns = columns
+        self.buffer_size = buffer_size
+        self.buffer = array.array("f")
+        self.count = 0
+        self.file.write(_npy_header(self._shape()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _shape(self):
+        if self.columns is None:
+            return (self.count,)
+        return (self.count, self.columns)
+
+    def write(self, score):
+        if self.columns is None:
+            self.buffer.append(score)
+        else:
+            if len(score) != self.columns:
+                raise ValueError(
+                    "Expected a score of %d floats, got %d" % (self.columns, len(score))
+                )
+            self.buffer.extend(score)
+        self.count += 1
+        if self.count % self.buffer_size == 0:
+            self.flush()
+
+    def flush(self):
+        self.buffer.tofile(self.file)
+        self.buffer = array.array("f")
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.seek(0)
+            self.file.write(_npy_header(self._shape()))
+            self.file.close()
+
+
+def open_score_writer(path, format, columns=None, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Opens the writer of a format of SCORE_FORMATS.
+
+    Args:
+        columns: the number of floats of every score, for list valued scores like
+            the precisions. Only the "npy" format needs it.
+    """
+    if format == "jsonl":
+        return JsonLinesWriter(path, buffer_size)
+    if format == "npy":
+        return NpyWriter(path, columns, buffer_size)
+    raise ValueError(
+        "format must be one of %s, got %r" % (", ".join(SCORE_FORMATS), format)
+    )
+
+
+def write_scores(path, scores, format="jsonl", columns=None):
+    """Writes an iterable of scores, consuming it one score at a time.
+
+    Returns:
+        The number of scores written.
+    """
+    with open_score_writer(path, format, columns) as writer:
+        for score in scores:
+            writer.write(score)
+    return writer.count
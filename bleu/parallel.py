@@ -0,0 +1,160 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Process-pool scoring of large corpora.
+
+The corpus is cut into chunks of consecutive segments, and every chunk is scored
+for sufficient statistics in a worker process. Since the statistics of a corpus
+are the sum of those of its segments, merging the chunks gives exactly the result
+of the serial path.
+
+A ReferenceIndex is sent once to every worker when the pool starts, and the chunks
+only carry the bounds of their slice of it.
+"""
+
+import array
+import concurrent.futures
+
+from bleu.metrics import (
+    STATISTICS_TYPECODE,
+    ReferenceIndex,
+    _corpus_totals,
+    bleu_statistics,
+    statistics_width,
+)
+
+__all__ = [
+    "parallel_statistics",
+    "parallel_totals",
+]
+
+# Number of segments sent to a worker at a time.
+DEFAULT_CHUNKSIZE = 1000
+
+
+# The ReferenceIndex of the corpus scored by a worker process.
+_reference_index = None
+
+
+def _set_reference_index(index):
+    global _reference_index
+    _reference_index = index
+
+
+def _iter_chunks(translation_corpus, reference_corpus, chunksize):
+    for start in range(0, len(translation_corpus), chunksize):
+        stop = start + chunksize
+        if isinstance(reference_corpus, ReferenceIndex):
+            references = slice(start, stop)
+        else:
+            references = reference_corpus[start:stop]
+        yield translation_corpus[start:stop], references
+
+
+def _chunk_references(references):
+    if isinstance(references, slice):
+        return _reference_index.slice(references.start, references.stop)
+    return references
+
+
+def _chunk_statistics(args):
+    translation_corpus, references, max_order, engine = args
+    return bleu_statistics(translation_corpus, _chunk_references(references), max_order, engine)
+
+
+def _chunk_totals(args):
+    translation_corpus, references, max_order, engine = args
+    return _corpus_totals(translation_corpus, _chunk_references(references), max_order, engine)
+
+
+def _map_chunks(func, translation_corpus, reference_corpus, max_order, engine, workers, chunksize):
+    if len(translation_corpus) != len(reference_corpus):
+        raise ValueError(
+            "translation_corpus has %d segments but reference_corpus has %d"
+            % (len(translation_corpus), len(reference_corpus))
+        )
+    chunksize = chunksize or DEFAULT_CHUNKSIZE
+    tasks = (
+        (translations, references, max_order, engine)
+        for translations, references in _iter_chunks(
+            translation_corpus, reference_corpus, chunksize
+        )
+    )
+    if isinstance(reference_corpus, ReferenceIndex):
+        pool = concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_set_reference_index, initargs=(reference_corpus,)
+        )
+    else:
+        pool = concurrent.futures.ProcessPoolExecutor(workers)
+    with pool as executor:
+        # map() yields the results in the order of the chunks.
+        for result in executor.map(func, tasks):
+            yield result
+
+
+def parallel_statistics(
+    translation_corpus, reference_corpus, max_order, engine=None, workers=None, chunksize=None
+):
+    """Computes bleu_statistics() of a corpus in a pool of worker processes.
+
+    Args:
+        workers: number of worker processes. Default to the number of CPUs.
+        chunksize: number of segments scored by a worker at a time. Larger chunks
+            cost less inter-process communication on short segments.
+
+    Returns:
+        The same array as bleu_statistics(), in the order of the segments.
+    """
+    stats = array.array(STATISTICS_TYPECODE)
+    for chunk in _map_chunks(
+        _chunk_statistics,
+        translation_corpus,
+        reference_corpus,
+        max_order,
+        engine,
+        workers,
+        chunksize,
+    ):
+        stats.extend(chunk)
+    return stats
+
+
+def parallel_totals(
+    translation_corpus, reference_corpus, max_order, engine=None, workers=None, chunksize=None
+):
+    """Computes the summed statistics of a corpus in a pool of worker processes.
+
+    Only one row of totals per chunk is sent back from the workers.
+    """
+    totals = [0] * statistics_width(max_order)
+    for chunk in _map_chunks(
+        _chunk_totals,
+        translation_corpus,
+        reference_corpus,
+        max_order,
+        engine,
+        workers,
+        chunksize,
+    ):
+        for i, value in enumerate(chunk):
+            totals[i] += value
+    return totals
@@ -0,0 +1,152 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Opt-in instrumentation of the scoring pipeline.
+
+A Profiler is passed as the profiler argument of the loaders and scorers, which
+then record the wall time of their stages and count what they process. When no
+profiler is passed, the uninstrumented code path runs, so profiling costs nothing
+unless it is asked for.
+"""
+
+import collections
+import contextlib
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not on Windows.
+    resource = None
+
+__all__ = [
+    "Profiler",
+]
+
+
+class Profiler(object):
+    """Collects per-stage wall time, counters, throughput and peak memory.
+
+    Args:
+        trace_memory: whether to trace Python allocations with tracemalloc to get
+            their peak. This slows the pipeline down noticeably.
+        callback: a function called with (stage, seconds) every time a stage ends,
+            e.g. to forward the timings to a monitoring system. Stages run per
+            segment are summed and reported once, when all segments are done.
+    """
+
+    def __init__(self, trace_memory=False, callback=None):
+        self.seconds = collections.Counter()
+        self.counts = collections.Counter()
+        self.callback = callback
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def add_time(self, stage, seconds):
+        self.seconds[stage] += seconds
+        if self.callback is not None:
+            self.callback(stage, seconds)
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Times the body of a with statement as a stage."""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def peak_memory(self):
+        """Returns a dict of the peak memory measures available, in bytes."""
+        memory = {}
+        if self.trace_memory and tracemalloc.is_tracing():
+            memory["traced_python"] = tracemalloc.get_traced_memory()[1]
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux.
+            memory["max_rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return memory
+
+    def report(self):
+        """Returns all the measures as a JSON-compatible dict."""
+        total = sum(self.seconds.values())
+        throughput = {}
+        if total:
+            for name, n in self.counts.items():
+                throughput["%s_per_second" % name] = n / total
+        return {
+            "seconds": dict(self.seconds),
+            "counts": dict(self.counts),
+            "throughput": throughput,
+            "peak_memory": self.peak_memory(),
+        }
+
+    def format(self):
+        """Returns the report as human readable text."""
+        report = self.report()
+        total = sum(self.seconds.values()) or 1.0
+        lines = ["%-12s %10s %7s" % ("stage", "seconds", "share")]
+        for stage, seconds in self.seconds.most_common():
+            lines.append("%-12s %10.4f %6.1f%%" % (stage, seconds, 100.0 * seconds / total))
+        if self.counts:
+            lines.append("%-12s %10s" % ("counter", "count"))
+        for name, n in sorted(self.counts.items()):
+            lines.append("%-12s %10d" % (name, n))
+        for name, value in sorted(report["throughput"].items()):
+            lines.append("%-20s %14.1f" % (name, value))
+        for name, value in sorted(report["peak_memory"].items()):
+            lines.append("peak %-15s %14d bytes" % (name, value))
+        return "\n".join(lines)
+
+    def close(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def profile_rows(rows, profiler, stage, max_order):
+    """Times the production of every row of statistics as a stage.
+
+    The number of segments and of translation n-grams are counted from the rows.
+    The measures are summed here and reported to the profiler once, at the end.
+    """
+    rows = iter(rows)
+    clock = time.perf_counter
+    seconds = 0.0
+    n_segments = n_ngrams = 0
+    try:
+        while True:
+            start = clock()
+            try:
+                row = next(rows)
+            except StopIteration:
+                return
+            seconds += clock() - start
+            n_segments += 1
+            n_ngrams += sum(row[2 + max_order :])
+            yield row
+    finally:
+        profiler.add_time(stage, seconds)
+        profiler.count("segments", n_segments)
+        profiler.count("ngrams", n_ngrams)
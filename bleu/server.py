@@ -0,0 +1,457 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Long-running scoring server with resident reference sets.
+
+Loading a reference corpus and extracting its n-grams costs far more than scoring
+a few translations against it, so the server does it once at startup for every
+named reference set, and keeps the n-gram tables in memory as a ReferenceIndex.
+
+Requests and responses are JSON objects, one per line, read from stdin and written
+to stdout, or exchanged over a Unix socket. A request scores translations against
+segments of a reference set::
+
+    {"id": 1, "references": "dev", "translations": ["the cat sat", "a dog"],
+     "segments": [0, 7], "level": "sentence", "max_order": 4, "smooth": true}
+
+- translations: whitespace tokenized strings, or lists of tokens.
+- segments: the index in the reference set of the references of every translation.
+  Default to translation i using the references of segment i.
+- level: "corpus" (the default) scores the translations as one corpus, "sentence"
+  scores every translation on its own.
+- max_order, smooth: as in bleu_corpus_level(). max_order must not exceed the
+  order the server was started with.
+
+The response holds the same id and the fields of a BleuScore, or the list of them
+under "scores" for the sentence level, or an "error" message.
+
+Requests arriving within a few milliseconds of each other are scored as one batch
+per reference set, in the server process or in a pool of worker processes that
+hold their own copy of the reference sets::
+
+    python -m bleu.server -n 4 --references dev=ref1.txt,ref2.txt test=test_ref.txt
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import sys
+
+from bleu.integer import segment_statistics
+from bleu.metrics import (
+    DEFAULT_MAX_ORDER,
+    ReferenceIndex,
+    bleu_from_statistics,
+    statistics_width,
+    truncate_statistics_row,
+)
+from bleu.utils import load_reference_corpus
+
+__all__ = [
+    "ScoringServer",
+    "load_reference_sets",
+]
+
+# How long a batch waits for more requests once its first one arrived, in seconds.
+DEFAULT_BATCH_DELAY = 0.002
+
+DEFAULT_BATCH_SIZE = 256
+
+LEVELS = ("corpus", "sentence")
+
+
+def load_reference_sets(specs, max_order=None):
+    """Builds the ReferenceIndex of every named reference set.
+
+    Args:
+        specs: dict of reference files keyed by the name of their set.
+        max_order: the maximum order that can be requested from the sets.
+
+    Returns:
+        A dict of ReferenceIndex keyed by the name of their set.
+    """
+    return {
+        name: ReferenceIndex(load_reference_corpus(files), max_order, engine="integer")
+        for name, files in specs.items()
+    }
+
+
+def _parse_spec(spec):
+    name, sep, files = spec.partition("=")
+    if not sep or not name or not files:
+        raise argparse.ArgumentTypeError("expected NAME=FILE[,FILE...], got %r" % spec)
+    return name, files.split(",")
+
+
+# The reference sets of a worker process.
+_reference_sets = None
+
+
+def _set_reference_sets(reference_sets):
+    global _reference_sets
+    _reference_sets = reference_sets
+
+
+def score_batch(reference_sets, name, tasks):
+    """Computes the statistics of a batch of requests against one reference set.
+
+    Args:
+        reference_sets: dict of ReferenceIndex keyed by name.
+        name: the name of the reference set of all the tasks.
+        tasks: list of (translations, segments) pairs, the translations being lists
+            of tokens and the segments their indices in the reference set.
+
+    Returns:
+        A list holding the list of rows of statistics of every task, or the exception
+        raised when scoring it, so that a failing task only fails its own request.
+    """
+    index = reference_sets[name]
+    results = []
+    for translations, segments in tasks:
+        try:
+            results.append(_score_task(index, translations, segments))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _score_task(index, translations, segments):
+    vocab = index.vocab
+    ngram_codes = index.ngram_counts
+    reference_lengths = index.reference_lengths
+    max_order = index.max_order
+    return [
+        segment_statistics(
+            vocab.lookup(translation),
+            ngram_codes[segment],
+            reference_lengths[segment],
+            max_order,
+        )
+        for translation, segment in zip(translations, segments)
+    ]
+
+
+def _worker_score_batch(name, tasks):
+    return score_batch(_reference_sets, name, tasks)
+
+
+class _Request(object):
+    __slots__ = ("id", "name", "translations", "segments", "level", "max_order", "smooth")
+
+    def __init__(self, request, reference_sets):
+        self.id = request.get("id")
+        self.name = request.get("references")
+        if self.name not in reference_sets:
+            raise ValueError("unknown reference set %r" % (self.name,))
+        index = reference_sets[self.name]
+
+        translations = request.get("translations")
+        if translations is None and "translation" in request:
+            translations = [request["translation"]]
+        if not isinstance(translations, list):
+            raise ValueError("translations must be a list")
+        for translation in translations:
+            if not isinstance(translation, str) and not (
+                isinstance(translation, list)
+                and all(isinstance(token, str) for token in translation)
+            ):
+                raise ValueError(
+                    "a translation must be a string or a list of strings, got %r"
+                    % (translation,)
+                )
+        self.translations = [t.split() if isinstance(t, str) else t for t in translations]
+
+        segments = request.get("segments")
+        if segments is None:
+            segments = list(range(len(self.translations)))
+        if len(segments) != len(self.translations):
+            raise ValueError(
+                "You passed %d translations but %d segments"
+                % (len(self.translations), len(segments))
+            )
+        for segment in segments:
+            if not isinstance(segment, int) or not 0 <= segment < len(index):
+                raise ValueError(
+                    "segment %r is out of the %d segments of %r"
+                    % (segment, len(index), self.name)
+                )
+        self.segments = segments
+
+        self.level = request.get("level", "corpus")
+        if self.level not in LEVELS:
+            raise ValueError("level must be one of %s" % ", ".join(LEVELS))
+        self.max_order = request.get("max_order")
+        if self.max_order is None:
+            self.max_order = index.max_order
+        if not isinstance(self.max_order, int) or self.max_order < 1:
+            raise ValueError(
+                "max_order must be a positive integer, got %r" % (self.max_order,)
+            )
+        index.check_order(self.max_order)
+        self.smooth = bool(request.get("smooth", False))
+
+    def respond(self, rows, max_order):
+        if self.max_order != max_order:
+            rows = [
+                truncate_statistics_row(row, max_order, self.max_order) for row in rows
+            ]
+        if self.level == "sentence":
+            return {
+                "id": self.id,
+                "scores": [bleu_from_statistics(row, self.smooth)._asdict() for row in rows],
+            }
+        totals = [0] * statistics_width(self.max_order)
+        for row in rows:
+            for i, value in enumerate(row):
+                totals[i] += value
+        response = {"id": self.id}
+        response.update(bleu_from_statistics(totals, self.smooth)._asdict())
+        return response
+
+
+class ScoringServer(object):
+    """Scores requests against resident reference sets, in micro-batches.
+
+    Args:
+        reference_sets: dict of ReferenceIndex of engine "integer" keyed by name,
+            as returned by load_reference_sets().
+        workers: number of worker processes to score the batches with. If 0, they
+            are scored in the event loop, which has the least latency on small
+            requests.
+        batch_delay: how long a batch waits for more requests, in seconds.
+        batch_size: maximum number of requests in a batch.
+    """
+
+    def __init__(
+        self,
+        reference_sets,
+        workers=0,
+        batch_delay=DEFAULT_BATCH_DELAY,
+        batch_size=DEFAULT_BATCH_SIZE,
+    ):
+        for name, index in reference_sets.items():
+            if index.engine != "integer":
+                raise ValueError("reference set %r must use the integer engine" % name)
+        self.reference_sets = reference_sets
+        self.batch_delay = batch_delay
+        self.batch_size = batch_size
+        self.executor = None
+        if workers:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                workers, initializer=_set_reference_sets, initargs=(reference_sets,)
+            )
+        self._queue = None
+        self._batcher = None
+
+    async def score(self, request):
+        """Scores a request, given as a dict, and returns the response dict."""
+        try:
+            parsed = _Request(request, self.reference_sets)
+        except (TypeError, ValueError, AttributeError) as e:
+            return {"id": request.get("id") if isinstance(request, dict) else None,
+                    "error": str(e)}
+        if self._batcher is None:
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.ensure_future(self._run_batches())
+        future = asyncio.get_event_loop().create_future()
+        await self._queue.put((parsed, future))
+        return await future
+
+    async def handle_line(self, line):
+        """Scores a request given as a line of JSON, and returns the response line."""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return json.dumps({"id": None, "error": "invalid JSON: %s" % e})
+        if not isinstance(request, dict):
+            return json.dumps({"id": None, "error": "a request must be a JSON object"})
+        return json.dumps(await self.score(request))
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.batch_delay
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run_batches(self):
+        while True:
+            batch = await self._next_batch()
+            groups = {}
+            for request, future in batch:
+                groups.setdefault(request.name, []).append((request, future))
+            if self.executor is None:
+                for name, group in groups.items():
+                    self._resolve(name, group, None)
+            else:
+                # The groups of different reference sets run on different workers.
+                loop = asyncio.get_event_loop()
+                for name, group in groups.items():
+                    tasks = [(request.translations, request.segments) for request, _ in group]
+                    result = loop.run_in_executor(
+                        self.executor, _worker_score_batch, name, tasks
+                    )
+                    result.add_done_callback(
+                        lambda result, name=name, group=group: self._resolve(
+                            name, group, result
+                        )
+                    )
+
+    def _resolve(self, name, group, result):
+        try:
+            if result is None:
+                tasks = [(request.translations, request.segments) for request, _ in group]
+                all_rows = score_batch(self.reference_sets, name, tasks)
+            else:
+                all_rows = result.result()
+        except Exception as e:
+            for request, future in group:
+                if not future.done():
+                    future.set_result({"id": request.id, "error": str(e)})
+            return
+        max_order = self.reference_sets[name].max_order
+        for (request, future), rows in zip(group, all_rows):
+            if future.done():
+                continue
+            # A request that can not be scored must not stop the batches of the others.
+            try:
+                if isinstance(rows, Exception):
+                    raise rows
+                response = request.respond(rows, max_order)
+            except Exception as e:
+                response = {"id": request.id, "error": "%s: %s" % (type(e).__name__, e)}
+            future.set_result(response)
+
+    async def serve_lines(self, readline, write):
+        """Answers the requests read by a coroutine function until it returns nothing.
+
+        Args:
+            readline: coroutine function returning the next request line.
+            write: coroutine function writing a response line.
+
+        The requests are scored concurrently, so the responses can come out of order.
+        """
+        lock = asyncio.Lock()
+        pending = set()
+
+        async def answer(line):
+            response = await self.handle_line(line)
+            async with lock:
+                await write(response + "\n")
+
+        while True:
+            line = await readline()
+            if not line:
+                break
+            if line.strip():
+                task = asyncio.ensure_future(answer(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+
+    async def serve_stdio(self):
+        """Answers the requests read from stdin on stdout."""
+        loop = asyncio.get_event_loop()
+
+        async def readline():
+            # Reading stdin in a thread works whatever stdin is: a pipe, a file or a tty.
+            return await loop.run_in_executor(None, sys.stdin.readline)
+
+        async def write(line):
+            sys.stdout.write(line)
+            sys.stdout.flush()
+
+        await self.serve_lines(readline, write)
+
+    async def serve_unix(self, path):
+        """Answers the requests of every connection to a Unix socket, forever."""
+
+        async def connected(reader, writer):
+            async def write(line):
+                writer.write(line.encode("utf-8"))
+                await writer.drain()
+
+            try:
+                await self.serve_lines(reader.readline, write)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_unix_server(connected, path)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve BLEU scores of resident reference sets.")
+    parser.add_argument(
+        "--references",
+        nargs="+",
+        type=_parse_spec,
+        required=True,
+        metavar="NAME=FILE[,FILE...]",
+        help="reference sets to keep in memory, each a comma separated list of files",
+    )
+    parser.add_argument("-n", "--max-order", type=int, default=DEFAULT_MAX_ORDER)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--socket", help="Unix socket to listen on instead of stdin")
+    parser.add_argument("--batch-delay", type=float, default=DEFAULT_BATCH_DELAY)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    server = ScoringServer(
+        load_reference_sets(dict(args.references), args.max_order),
+        workers=args.workers,
+        batch_delay=args.batch_delay,
+        batch_size=args.batch_size,
+    )
+
+    async def serve():
+        try:
+            if args.socket:
+                await server.serve_unix(args.socket)
+            else:
+                await server.serve_stdio()
+        finally:
+            server.close()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Statistics files of corpus shards, and their exact merge.
+
+BLEU is not an average of the BLEU of the shards of a corpus, but a function of
+the sum of their sufficient statistics. A shard is scored where it lives into a
+small statistics file, holding its totals and optionally its per-segment rows,
+and any number of such files are merged into the statistics of the whole corpus.
+
+A statistics file is a JSON object::
+
+    {"format": "bleu-statistics", "version": 1, "max_order": 4,
+     "n_segments": 1000, "totals": [...], "segments": [[...], ...],
+     "metadata": {...}}
+
+where "segments" is only present when the rows were asked for. To merge files
+from the command line and print the corpus BLEU::
+
+    python -m bleu.shards shard-*.json --smooth
+"""
+
+import argparse
+import array
+import collections
+import json
+
+from bleu.metrics import (
+    STATISTICS_TYPECODE,
+    bleu_from_statistics,
+    iter_statistics_rows,
+    statistics_width,
+    sum_statistics,
+    truncate_statistics_row,
+)
+
+__all__ = [
+    "StatisticsFile",
+    "write_statistics",
+    "read_statistics",
+    "merge_statistics",
+]
+
+FORMAT = "bleu-statistics"
+VERSION = 1
+
+# Hold the content of a statistics file. rows is None when the file has no rows.
+StatisticsFile = collections.namedtuple(
+    "StatisticsFile", ["max_order", "n_segments", "totals", "rows", "metadata"]
+)
+
+
+def write_statistics(path, stats, max_order, segments=False, metadata=None):
+    """Writes the statistics of a shard to a file.
+
+    Args:
+        path: the file to write.
+        stats: array returned by bleu_statistics() on the shard.
+        max_order: the max_order of stats.
+        segments: whether to write the per-segment rows too, which sentence level
+            scores need. Without them, the file holds a single row of totals.
+        metadata: a JSON-compatible dict stored along, e.g. the name of the shard.
+    """
+    n_segments = len(stats) // statistics_width(max_order)
+    content = {
+        "format": FORMAT,
+        "version": VERSION,
+        "max_order": max_order,
+        "n_segments": n_segments,
+        "totals": sum_statistics(stats, max_order),
+        "metadata": metadata or {},
+    }
+    if segments:
+        content["segments"] = [
+            list(row) for row in iter_statistics_rows(stats, max_order)
+        ]
+    with open(path, "w") as f:
+        json.dump(content, f, separators=(",", ":"))
+
+
+def read_statistics(path):
+    """Reads a file written by write_statistics().
+
+    Returns:
+        A StatisticsFile, whose rows are an array as returned by bleu_statistics().
+
+    Raises:
+        ValueError: if the file is not a statistics file of a supported version.
+    """
+    with open(path) as f:
+        content = json.load(f)
+    if not isinstance(content, dict) or content.get("format") != FORMAT:
+        raise ValueError("%s is not a BLEU statistics file" % path)
+    if content.get("version") != VERSION:
+        raise ValueError(
+            "%s has version %r, only version %d is supported"
+            % (path, content.get("version"), VERSION)
+        )
+    max_order = content["max_order"]
+    width = statistics_width(max_order)
+    totals = content["totals"]
+    if len(totals) != width:
+        raise ValueError("%s has %d totals, expected %d" % (path, len(totals), width))
+    rows = None
+    if "segments" in content:
+        rows = array.array(STATISTICS_TYPECODE)
+        for row in content["segments"]:
+            if len(row) != width:
+                raise ValueError("%s has a row of %d numbers, expected %d" % (path, len(row), width))
+            rows.extend(row)
+    return StatisticsFile(
+        max_order=max_order,
+        n_segments=content["n_segments"],
+        totals=totals,
+        rows=rows,
+        metadata=content.get("metadata", {}),
+    )
+
+
+def merge_statistics(files, max_order=None):
+    """Merges statistics files into the statistics of the whole corpus.
+
+    Args:
+        files: paths of files written by write_statistics(), or StatisticsFile.
+            The rows are concatenated in the order of the files.
+        max_order: the order to merge the statistics at. Default to the smallest
+            max_order of the files, since statistics are exactly truncated to a
+            lower order but cannot be extended to a higher one.
+
+    Returns:
+        A StatisticsFile whose totals give the corpus BLEU with bleu_from_statistics().
+        Its rows are None unless every file has rows, and its metadata holds the list
+        of the metadata of the files under "shards".
+    """
+    shards = [f if isinstance(f, StatisticsFile) else read_statistics(f) for f in files]
+    if not shards:
+        raise ValueError("There are no statistics files to merge")
+    lowest = min(shard.max_order for shard in shards)
+    if max_order is None:
+        max_order = lowest
+    elif max_order > lowest:
+        raise ValueError(
+            "Cannot merge at order %d statistics collected up to order %d"
+            % (max_order, lowest)
+        )
+
+    totals = [0] * statistics_width(max_order)
+    rows = array.array(STATISTICS_TYPECODE)
+    for shard in shards:
+        shard_totals = truncate_statistics_row(shard.totals, shard.max_order, max_order)
+        for i, value in enumerate(shard_totals):
+            totals[i] += value
+        if rows is None or shard.rows is None:
+            rows = None
+        elif shard.max_order == max_order:
+            rows.extend(shard.rows)
+        else:
+            for row in iter_statistics_rows(shard.rows, shard.max_order):
+                rows.extend(truncate_statistics_row(row, shard.max_order, max_order))
+    return StatisticsFile(
+        max_order=max_order,
+        n_segments=sum(shard.n_segments for shard in shards),
+        totals=totals,
+        rows=rows,
+        metadata={"shards": [shard.metadata for shard in shards]},
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge statistics files into corpus BLEU.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("-n", "--max-order", type=int)
+    parser.add_argument("--smooth", action="store_true")
+    args = parser.parse_args()
+    merged = merge_statistics(args.files, args.max_order)
+    score = bleu_from_statistics(merged.totals, args.smooth)
+    print(json.dumps(dict(score._asdict(), n_segments=merged.n_segments)))
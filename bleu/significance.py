@@ -0,0 +1,185 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Bootstrap confidence intervals and paired significance tests of BLEU.
+
+Resampling a test set with replacement only changes how many times each segment
+is counted, so the statistics of a resampled corpus are a weighted sum of the
+per-segment statistics. With the statistics extracted once by bleu_statistics(),
+every bootstrap sample then costs one row of a matrix product, and thousands of
+samples are scored together with bleu.vectorized.
+
+Reference: Philipp Koehn. Statistical significance tests for machine translation
+evaluation. EMNLP 2004.
+"""
+
+import collections
+
+import numpy as np
+
+from bleu.metrics import (
+    DEFAULT_MAX_ORDER,
+    bleu_from_statistics,
+    statistics_width,
+)
+from bleu.vectorized import bleu_from_statistics_array
+
+__all__ = [
+    "BootstrapResult",
+    "PairedBootstrapResult",
+    "bootstrap_bleu",
+    "paired_bootstrap",
+]
+
+# Hold the result of bootstrap_bleu(). score is the BleuScore of the whole corpus,
+# and [low, high] the confidence interval of its bleu.
+BootstrapResult = collections.namedtuple(
+    "BootstrapResult", ["score", "mean", "low", "high"]
+)
+
+# Hold the result of paired_bootstrap(). delta is the bleu of system a minus that
+# of system b, [low, high] its confidence interval, and p_value the probability
+# that system a is not better than system b.
+PairedBootstrapResult = collections.namedtuple(
+    "PairedBootstrapResult", ["score_a", "score_b", "delta", "low", "high", "p_value"]
+)
+
+DEFAULT_N_SAMPLES = 1000
+
+# Bound on the number of (sample, segment) weights held in memory at once.
+_MAX_WEIGHTS = 1 << 24
+
+
+def _as_matrix(stats, max_order):
+    return np.asarray(stats, dtype=np.int64).reshape(-1, statistics_width(max_order))
+
+
+def _iter_sample_weights(n_segments, n_samples, rng):
+    """Yields the number of times each segment is drawn, for chunks of samples."""
+    chunk = max(1, _MAX_WEIGHTS // max(n_segments, 1))
+    probabilities = np.full(n_segments, 1.0 / n_segments)
+    for start in range(0, n_samples, chunk):
+        size = min(chunk, n_samples - start)
+        yield rng.multinomial(n_segments, probabilities, size=size)
+
+
+def _sample_bleu(matrices, n_samples, smooth, seed):
+    """Computes the bleu of every system on the same bootstrap samples.
+
+    Returns:
+        An array of shape (n_systems, n_samples).
+    """
+    rng = np.random.default_rng(seed)
+    n_segments = len(matrices[0])
+    samples = [[] for _ in matrices]
+    for weights in _iter_sample_weights(n_segments, n_samples, rng):
+        for system, matrix in enumerate(matrices):
+            totals = weights @ matrix
+            samples[system].append(bleu_from_statistics_array(totals, smooth).bleu)
+    return np.array([np.concatenate(s) for s in samples])
+
+
+def _interval(values, confidence):
+    tail = (1.0 - confidence) / 2.0 * 100
+    low, high = np.percentile(values, [tail, 100 - tail])
+    return float(low), float(high)
+
+
+def bootstrap_bleu(
+    stats,
+    max_order=None,
+    smooth=False,
+    n_samples=DEFAULT_N_SAMPLES,
+    confidence=0.95,
+    seed=None,
+):
+    """Computes a bootstrap confidence interval of corpus level BLEU.
+
+    Args:
+        stats: per-segment statistics returned by bleu_statistics().
+        max_order: the max_order the statistics were collected with.
+        smooth: Whether or not to apply Lin et al. 2004 smoothing.
+        n_samples: number of bootstrap samples.
+        confidence: the confidence level of the interval.
+        seed: seed of the random generator, for reproducible results.
+
+    Returns:
+        A BootstrapResult.
+    """
+    max_order = max_order or DEFAULT_MAX_ORDER
+    matrix = _as_matrix(stats, max_order)
+    samples = _sample_bleu([matrix], n_samples, smooth, seed)[0]
+    low, high = _interval(samples, confidence)
+    return BootstrapResult(
+        score=bleu_from_statistics(matrix.sum(axis=0).tolist(), smooth),
+        mean=float(samples.mean()),
+        low=low,
+        high=high,
+    )
+
+
+def paired_bootstrap(
+    stats_a,
+    stats_b,
+    max_order=None,
+    smooth=False,
+    n_samples=DEFAULT_N_SAMPLES,
+    confidence=0.95,
+    seed=None,
+):
+    """Tests whether system a is significantly better than system b.
+
+    Both systems are scored on the same bootstrap samples of the test set, and the
+    p-value is the fraction of samples in which system a does not beat system b.
+
+    Args:
+        stats_a: per-segment statistics of system a returned by bleu_statistics().
+        stats_b: per-segment statistics of system b on the same references.
+        max_order: the max_order the statistics were collected with.
+        smooth: Whether or not to apply Lin et al. 2004 smoothing.
+        n_samples: number of bootstrap samples.
+        confidence: the confidence level of the interval of the difference.
+        seed: seed of the random generator, for reproducible results.
+
+    Returns:
+        A PairedBootstrapResult.
+    """
+    max_order = max_order or DEFAULT_MAX_ORDER
+    matrix_a = _as_matrix(stats_a, max_order)
+    matrix_b = _as_matrix(stats_b, max_order)
+    if matrix_a.shape != matrix_b.shape:
+        raise ValueError(
+            "The two systems have %d and %d segments" % (len(matrix_a), len(matrix_b))
+        )
+    samples_a, samples_b = _sample_bleu([matrix_a, matrix_b], n_samples, smooth, seed)
+    deltas = samples_a - samples_b
+    score_a = bleu_from_statistics(matrix_a.sum(axis=0).tolist(), smooth)
+    score_b = bleu_from_statistics(matrix_b.sum(axis=0).tolist(), smooth)
+    low, high = _interval(deltas, confidence)
+    return PairedBootstrapResult(
+        score_a=score_a,
+        score_b=score_b,
+        delta=score_a.bleu - score_b.bleu,
+        low=low,
+        high=high,
+        p_value=float(np.mean(deltas <= 0)),
+    )
@@ -0,0 +1,164 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Sweep of smoothing methods over precomputed statistics.
+
+Smoothing only changes how the modified precisions are derived from the match
+counts, so every method can be applied to the statistics extracted once by
+bleu_statistics(). The precisions of every method are computed on the whole
+statistics matrix at once, and the scores of all orders follow from cumulative
+sums of their logs, since the statistics of order n are the first n orders of
+those of max_order.
+
+The methods are those of Chen and Cherry:
+
+- "none": no smoothing, as bleu_from_statistics(row, smooth=False).
+- "add-one": add one to the matches and possible matches of every order, the
+  smoothing of Lin and Och, as bleu_from_statistics(row, smooth=True).
+- "add-one-higher": add one to those of the orders above one only.
+- "floor": give the orders without matches FLOOR_EPSILON matches.
+- "exp-decay": give the k-th order without matches 1 / 2^k matches, as in NIST.
+
+Reference: Boxing Chen and Colin Cherry. A systematic comparison of smoothing
+techniques for sentence-level BLEU. WMT 2014.
+"""
+
+import collections
+
+import numpy as np
+
+from bleu.metrics import DEFAULT_MAX_ORDER, statistics_width
+
+__all__ = [
+    "SMOOTHING_METHODS",
+    "SmoothingSweep",
+    "smooth_precisions",
+    "smoothing_sweep",
+]
+
+SMOOTHING_METHODS = ("none", "add-one", "add-one-higher", "floor", "exp-decay")
+
+# Matches given to the orders without any by the "floor" method.
+FLOOR_EPSILON = 0.1
+
+# Hold the result of smoothing_sweep(). sentence[i, j, k] is the BLEU of segment k
+# with methods[i] at orders[j], and corpus[i, j] that of the whole corpus.
+SmoothingSweep = collections.namedtuple(
+    "SmoothingSweep", ["methods", "orders", "sentence", "corpus"]
+)
+
+
+def smooth_precisions(matches, possible_matches, method):
+    """Computes the modified precisions of rows of counts with a smoothing method.
+
+    Args:
+        matches: array of shape (n_rows, max_order) of the clipped matches.
+        possible_matches: array of the same shape of the possible matches.
+        method: one of SMOOTHING_METHODS.
+
+    Returns:
+        A float array of the same shape. An order without possible matches has a
+        precision of 0, except with "add-one".
+    """
+    matches = np.asarray(matches, dtype=np.float64)
+    possible_matches = np.asarray(possible_matches, dtype=np.float64)
+    has_possible = possible_matches > 0
+    divisor = np.maximum(possible_matches, 1.0)
+    plain = np.where(has_possible, matches / divisor, 0.0)
+    if method == "none":
+        return plain
+    if method == "add-one":
+        return (matches + 1.0) / (possible_matches + 1.0)
+    if method == "add-one-higher":
+        precisions = (matches + 1.0) / (possible_matches + 1.0)
+        precisions[:, 0] = plain[:, 0]
+        return precisions
+    no_match = has_possible & (matches == 0)
+    if method == "floor":
+        return np.where(no_match, FLOOR_EPSILON / divisor, plain)
+    if method == "exp-decay":
+        k = np.cumsum(no_match, axis=1)
+        return np.where(no_match, 1.0 / (np.exp2(k) * divisor), plain)
+    raise ValueError(
+        "method must be one of %s, got %r" % (", ".join(SMOOTHING_METHODS), method)
+    )
+
+
+def _bleu_by_order(precisions, brevity_penalty, orders):
+    """Computes BLEU at several orders from the precisions of max_order."""
+    with np.errstate(divide="ignore"):
+        log_precisions = np.log(np.where(precisions > 0, precisions, 1.0))
+    # The geometric mean of order n is 0 as soon as one of its n precisions is.
+    has_zero = np.cumsum(precisions <= 0, axis=1) > 0
+    log_sums = np.cumsum(log_precisions, axis=1)
+    index = np.asarray(orders) - 1
+    geo_mean = np.where(
+        has_zero[:, index], 0.0, np.exp(log_sums[:, index] / np.asarray(orders, dtype=float))
+    )
+    return (geo_mean * brevity_penalty[:, None]).T
+
+
+def smoothing_sweep(stats, max_order=None, orders=None, methods=None):
+    """Computes BLEU with every smoothing method, at every order, at both levels.
+
+    Args:
+        stats: array returned by bleu_statistics(), or a matrix of one row of
+            statistics per segment.
+        max_order: the max_order of stats.
+        orders: the orders to score, default to 1 to max_order.
+        methods: the smoothing methods to score, default to SMOOTHING_METHODS.
+
+    Returns:
+        A SmoothingSweep. A row of zero translation or reference length scores 0.
+        The results may differ from bleu_from_statistics() in
+        the last bits as NumPy has its own log and exp.
+    """
+    max_order = max_order or DEFAULT_MAX_ORDER
+    orders = list(orders or range(1, max_order + 1))
+    methods = list(methods or SMOOTHING_METHODS)
+    if not all(1 <= order <= max_order for order in orders):
+        raise ValueError("orders must be within [1, %d], got %r" % (max_order, orders))
+    stats = np.asarray(stats, dtype=np.int64).reshape(-1, statistics_width(max_order))
+    # The corpus is scored as one more row, the sum of all others.
+    rows = np.vstack([stats, stats.sum(axis=0, keepdims=True)])
+
+    translation_length = rows[:, 0].astype(np.float64)
+    reference_length = rows[:, 1].astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = translation_length / reference_length
+        brevity_penalty = np.where(ratio > 1.0, 1.0, np.exp(1 - 1.0 / ratio))
+    # An empty translation or reference scores 0 whatever the smoothing, rather than
+    # the NaN of 0 / 0.
+    brevity_penalty[(translation_length == 0) | (reference_length == 0)] = 0.0
+
+    scores = np.empty((len(methods), len(orders), len(rows)))
+    for i, method in enumerate(methods):
+        precisions = smooth_precisions(
+            rows[:, 2 : 2 + max_order], rows[:, 2 + max_order :], method
+        )
+        scores[i] = _bleu_by_order(precisions, brevity_penalty, orders)
+    return SmoothingSweep(
+        methods=methods,
+        orders=orders,
+        sentence=scores[:, :, :-1],
+        corpus=scores[:, :, -1],
+    )
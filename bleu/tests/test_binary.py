@@ -0,0 +1,98 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import bleu
+from bleu.binary import binary_statistics, cached_corpus, compile_corpus, open_corpus
+from bleu.tests.data import REF_FILES, TRANS_FILES
+from bleu.utils import load_reference_corpus, load_translation_corpus
+
+
+class TestBinary(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_round_trip(self):
+        path = os.path.join(self.tmpdir, "refs.bin")
+        compile_corpus(REF_FILES, path)
+        with open_corpus(path) as corpus:
+            self.assertEqual(corpus.n_files, len(REF_FILES))
+            self.assertEqual(
+                [[corpus.tokenize(i, file) for file in range(corpus.n_files)]
+                 for i in range(len(corpus))],
+                load_reference_corpus(REF_FILES),
+            )
+
+    def test_statistics(self):
+        ref_path = os.path.join(self.tmpdir, "refs.bin")
+        reference_corpus = load_reference_corpus(REF_FILES)
+        for file in TRANS_FILES:
+            trans_path = os.path.join(self.tmpdir, "trans.bin")
+            with cached_corpus([file], trans_path) as translations, cached_corpus(
+                REF_FILES, ref_path
+            ) as references:
+                self.assertEqual(
+                    binary_statistics(translations, references),
+                    bleu.bleu_statistics(load_translation_corpus(file), reference_corpus),
+                )
+
+    def test_invalidation(self):
+        source = os.path.join(self.tmpdir, "trans.txt")
+        path = os.path.join(self.tmpdir, "trans.bin")
+        with open(source, "w") as f:
+            f.write("a b c\n")
+        with cached_corpus([source], path) as corpus:
+            self.assertEqual(corpus.tokenize(0), ["a", "b", "c"])
+            self.assertTrue(corpus.is_fresh())
+
+        with open(source, "w") as f:
+            f.write("a b c d\n")
+        with cached_corpus([source], path) as corpus:
+            self.assertEqual(corpus.tokenize(0), ["a", "b", "c", "d"])
+
+    def test_mismatch(self):
+        short = os.path.join(self.tmpdir, "short.txt")
+        with open(short, "w") as f:
+            f.write("")
+        with self.assertRaisesRegex(ValueError, "short.txt"):
+            compile_corpus([REF_FILES[0], short], os.path.join(self.tmpdir, "x.bin"))
+        self.assertEqual(os.listdir(self.tmpdir), ["short.txt"])
+
+    def test_corrupt_cache(self):
+        source = os.path.join(self.tmpdir, "trans.txt")
+        path = os.path.join(self.tmpdir, "trans.bin")
+        with open(source, "w") as f:
+            f.write("a b c\n")
+        for content in (b"", b"garbage", b"BLEUBIN\0\x01\0\0\0\xff\0\0\0{"):
+            with open(path, "wb") as f:
+                f.write(content)
+            with self.assertRaises(ValueError):
+                open_corpus(path)
+            with cached_corpus([source], path) as corpus:
+                self.assertEqual(corpus.tokenize(0), ["a", "b", "c"])
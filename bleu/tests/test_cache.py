@@ -0,0 +1,82 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import tempfile
+import unittest
+
+import bleu
+from bleu.cache import KEY_SIZE, StatisticsCache, cached_statistics
+from bleu.tests.data import REF_FILES, TRANS_FILES
+from bleu.utils import load_reference_corpus, load_translation_corpus
+
+
+class TestCache(unittest.TestCase):
+    reference_corpus = load_reference_corpus(REF_FILES) * 2
+    translation_corpus = load_translation_corpus(TRANS_FILES[0]) + load_translation_corpus(
+        TRANS_FILES[1]
+    )
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "stats.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_rescores_changed_segments(self):
+        expected = bleu.bleu_statistics(self.translation_corpus, self.reference_corpus)
+        with StatisticsCache(self.path) as cache:
+            self.assertEqual(
+                cached_statistics(self.translation_corpus, self.reference_corpus, cache),
+                expected,
+            )
+            self.assertEqual(len(cache), 2)
+
+        changed = [self.translation_corpus[0], self.translation_corpus[1][::-1]]
+        with StatisticsCache(self.path) as cache:
+            self.assertEqual(
+                cached_statistics(changed, self.reference_corpus, cache),
+                bleu.bleu_statistics(changed, self.reference_corpus),
+            )
+            # Only the changed segment was added.
+            self.assertEqual(len(cache), 3)
+            # The max order is part of the key.
+            self.assertEqual(
+                cached_statistics(changed, self.reference_corpus, cache, max_order=2),
+                bleu.bleu_statistics(changed, self.reference_corpus, max_order=2),
+            )
+            self.assertEqual(len(cache), 5)
+
+    def test_lru_eviction(self):
+        row_size = KEY_SIZE + 4 * bleu.statistics_width(4)
+        with StatisticsCache(self.path, max_bytes=2 * row_size) as cache:
+            cache.put_many([(b"a" * KEY_SIZE, [1] * 10), (b"b" * KEY_SIZE, [2] * 10)])
+            self.assertEqual(set(cache.get_many([b"a" * KEY_SIZE])), {b"a" * KEY_SIZE})
+            cache.put_many([(b"c" * KEY_SIZE, [3] * 10)])
+            self.assertEqual(len(cache), 2)
+            self.assertLessEqual(cache.size(), 2 * row_size)
+            # b is the least recently used.
+            self.assertEqual(
+                set(cache.get_many([b"a" * KEY_SIZE, b"b" * KEY_SIZE, b"c" * KEY_SIZE])),
+                {b"a" * KEY_SIZE, b"c" * KEY_SIZE},
+            )
@@ -0,0 +1,97 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import pickle
+import tempfile
+import unittest
+
+import bleu
+from bleu.corpus import CompactCorpus, CompactReferenceCorpus
+from bleu.tests.data import REF_FILES, TRANS_FILES
+from bleu.utils import load_reference_corpus, load_translation_corpus
+
+
+class TestCorpus(unittest.TestCase):
+    reference_corpus = load_reference_corpus(REF_FILES) * 2
+    translation_corpus = load_translation_corpus(TRANS_FILES[0]) + load_translation_corpus(
+        TRANS_FILES[1]
+    )
+
+    def test_same_shape(self):
+        references = CompactReferenceCorpus.from_corpus(self.reference_corpus)
+        self.assertEqual(len(references), 2)
+        self.assertEqual(
+            [[list(r) for r in refs] for refs in references], self.reference_corpus
+        )
+        # The references of both segments are stored once.
+        self.assertEqual(references.n_distinct, len(REF_FILES))
+
+        translations = CompactCorpus.from_corpus(self.translation_corpus)
+        segment = translations[0]
+        self.assertEqual(segment, self.translation_corpus[0])
+        self.assertEqual(segment[-1], self.translation_corpus[0][-1])
+        for i in (slice(1, 3), slice(-2, None), slice(None, None, -2), slice(5, 2)):
+            self.assertEqual(segment[i], self.translation_corpus[0][i])
+        with self.assertRaises(IndexError):
+            segment[len(segment)]
+        self.assertEqual(pickle.loads(pickle.dumps(translations))[1], translations[1])
+
+    def test_from_files(self):
+        references = CompactReferenceCorpus.from_files(REF_FILES)
+        self.assertEqual(
+            [[list(r) for r in refs] for refs in references],
+            load_reference_corpus(REF_FILES),
+        )
+        translations = CompactCorpus.from_file(TRANS_FILES[0])
+        self.assertEqual(list(translations), load_translation_corpus(TRANS_FILES[0]))
+
+    def test_from_files_strips_like_load_reference_corpus(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            files = []
+            for name, text in [("a.txt", "\n\na b\n  \nc\n\n"), ("b.txt", "d\n\ne\n")]:
+                files.append(os.path.join(tmpdir, name))
+                with open(files[-1], "w") as f:
+                    f.write(text)
+            self.assertEqual(
+                [[list(r) for r in refs] for refs in CompactReferenceCorpus.from_files(files)],
+                load_reference_corpus(files),
+            )
+            with open(files[1], "a") as f:
+                f.write("f\n")
+            with self.assertRaisesRegex(ValueError, "a.txt ended"):
+                CompactReferenceCorpus.from_files(files)
+
+    def test_scores(self):
+        translations = CompactCorpus.from_corpus(self.translation_corpus)
+        references = CompactReferenceCorpus.from_corpus(self.reference_corpus)
+        expected = bleu.bleu_corpus_level(self.translation_corpus, self.reference_corpus)
+        self.assertEqual(bleu.bleu_corpus_level(translations, references), expected)
+        self.assertEqual(
+            bleu.bleu_sentence_level(translations[1], references[1]),
+            bleu.bleu_sentence_level(self.translation_corpus[1], self.reference_corpus[1]),
+        )
+        for engine in ("counter", "integer"):
+            index = references.index(engine=engine)
+            # Both segments share one merged table.
+            self.assertIs(index.ngram_counts[0], index.ngram_counts[1])
+            self.assertEqual(bleu.bleu_corpus_level(translations, index), expected)
@@ -0,0 +1,78 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+import bleu
+from bleu.integer import Vocabulary, get_ngram_codes
+from bleu.tests.data import REF_FILES, TRANS_FILES
+from bleu.utils import load_reference_corpus, load_translation_corpus
+
+
+class TestInteger(unittest.TestCase):
+    reference_corpus = load_reference_corpus(REF_FILES)
+
+    def test_vocabulary(self):
+        vocab = Vocabulary()
+        ids = vocab.encode("the cat sat on the mat".split())
+        self.assertEqual(list(ids), [1, 2, 3, 4, 1, 5])
+        self.assertEqual(vocab.tokens(), ["the", "cat", "sat", "on", "mat"])
+
+    def test_ngram_codes(self):
+        ngram_counts = get_ngram_codes([1, 2, 1, 2], max_order=4)
+        self.assertEqual([sum(c.values()) for c in ngram_counts], [4, 3, 2, 1])
+        self.assertEqual([len(c) for c in ngram_counts], [2, 2, 2, 1])
+        # Codes never collide across orders.
+        codes = [code for counts in ngram_counts for code in counts]
+        self.assertEqual(len(codes), len(set(codes)))
+
+    def test_same_as_counter_engine(self):
+        for file in TRANS_FILES:
+            trans_corpus = load_translation_corpus(file)
+            for max_order in (1, 2, 4):
+                for smooth in (False, True):
+                    self.assertEqual(
+                        bleu.bleu_corpus_level(
+                            trans_corpus,
+                            self.reference_corpus,
+                            max_order,
+                            smooth,
+                            engine="integer",
+                        ),
+                        bleu.bleu_corpus_level(
+                            trans_corpus, self.reference_corpus, max_order, smooth
+                        ),
+                    )
+
+    def test_reference_index(self):
+        index = bleu.ReferenceIndex(self.reference_corpus, engine="integer")
+        trans_corpus = load_translation_corpus(TRANS_FILES[1])
+        self.assertEqual(
+            bleu.bleu_corpus_level(trans_corpus, index),
+            bleu.bleu_corpus_level(trans_corpus, self.reference_corpus),
+        )
+        with self.assertRaises(ValueError):
+            bleu.bleu_corpus_level(trans_corpus, index, engine="counter")
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            bleu.bleu_corpus_level([["a"]], [[["a"]]], engine="unknown")
@@ -0,0 +1,94 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import tempfile
+import unittest
+
+import bleu
+from bleu.binary import binary_statistics
+from bleu.loader import load_encoded_corpus, load_encoded_files
+from bleu.tests.data import REF_FILES, TRANS_FILES
+from bleu.utils import load_reference_corpus, load_translation_corpus
+
+
+class TestLoader(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_same_statistics(self):
+        for file in TRANS_FILES:
+            for workers in (1, 2):
+                translations, references = load_encoded_corpus(file, REF_FILES, workers)
+                self.assertIs(translations.vocab, references.vocab)
+                self.assertEqual(references.n_files, len(REF_FILES))
+                self.assertEqual(
+                    [translations.tokenize(0)], load_translation_corpus(file)
+                )
+                self.assertEqual(
+                    binary_statistics(translations, references),
+                    bleu.bleu_statistics(
+                        load_translation_corpus(file), load_reference_corpus(REF_FILES)
+                    ),
+                )
+
+    def test_tokens_as_str_split(self):
+        lines = ["café naïve x", "a\x1cb  c\r", "", "  d e  "]
+        ascii_lines = ["a b", "c\td", "", "e"]
+        files = [
+            self.write("u.txt", "\n".join(lines)),
+            self.write("a.txt", "\n".join(ascii_lines) + "\n"),
+        ]
+        encoded = load_encoded_files(files, workers=1)
+        self.assertEqual(len(encoded), 4)
+        for file, file_lines in enumerate([lines, ascii_lines]):
+            self.assertEqual(
+                [encoded.tokenize(i, file) for i in range(len(encoded))],
+                [line.split() for line in file_lines],
+            )
+
+    def test_line_count_mismatch(self):
+        files = [self.write("a.txt", "a\nb\n"), self.write("short.txt", "a\n")]
+        with self.assertRaisesRegex(ValueError, "short.txt has 1 lines"):
+            load_encoded_files(files, workers=1)
+
+    def test_empty_file(self):
+        encoded = load_encoded_files([self.write("empty.txt", "")])
+        self.assertEqual(len(encoded), 0)
+
+    def test_universal_newlines(self):
+        for text in ("a b\rc\r\nd\n\re", "café\rb\r"):
+            file = self.write("cr.txt", text)
+            encoded = load_encoded_files([file])
+            self.assertEqual(
+                [encoded.tokenize(i) for i in range(len(encoded))],
+                load_translation_corpus(file),
+            )
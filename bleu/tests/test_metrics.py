@@ -20,6 +20,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import json
+import pickle
 import unittest
 
 import bleu
@@ -77,3 +79,249 @@ class TestMetrics(unittest.TestCase):
             translation_corpus, reference_corpus, smooth=True
         )
         self.assertGreater(score.bleu, 0.0, msg="get non-zero after smoothing")
+
+    def test_statistics(self):
+        trans_corpus = load_translation_corpus(TRANS_FILES[1])
+        stats = bleu.bleu_statistics(trans_corpus, self.reference_corpus, max_order=4)
+        self.assertEqual(len(stats), bleu.statistics_width(4) * len(trans_corpus))
+
+        for smooth in (False, True):
+            self.assertEqual(
+                bleu.bleu_from_statistics(bleu.sum_statistics(stats, 4), smooth),
+                bleu.bleu_corpus_level(
+                    trans_corpus, self.reference_corpus, max_order=4, smooth=smooth
+                ),
+            )
+            self.assertEqual(
+                bleu.sentence_scores_from_statistics(stats, 4, smooth),
+                [
+                    bleu.bleu_sentence_level(t, r, max_order=4, smooth=smooth)
+                    for t, r in zip(trans_corpus, self.reference_corpus)
+                ],
+            )
+
+    def test_multi_order(self):
+        trans_corpus = load_translation_corpus(TRANS_FILES[0])
+        scores = bleu.bleu_corpus_level_multi(
+            trans_corpus, self.reference_corpus, orders=[1, 2, 3, 4]
+        )
+        self.assertEqual(len(scores), 8)
+        for (order, smooth), score in scores.items():
+            self.assertEqual(
+                score,
+                bleu.bleu_corpus_level(
+                    trans_corpus, self.reference_corpus, max_order=order, smooth=smooth
+                ),
+            )
+
+        stats = bleu.bleu_statistics(trans_corpus, self.reference_corpus, max_order=4)
+        self.assertEqual(
+            bleu.truncate_statistics(stats, max_order=4, order=2),
+            bleu.bleu_statistics(trans_corpus, self.reference_corpus, max_order=2),
+        )
+
+    def test_reference_index(self):
+        index = bleu.ReferenceIndex(self.reference_corpus, max_order=4)
+        self.assertEqual(len(index), len(self.reference_corpus))
+        for file in TRANS_FILES:
+            trans_corpus = load_translation_corpus(file)
+            for max_order in (2, 4):
+                self.assertEqual(
+                    bleu.bleu_corpus_level(trans_corpus, index, max_order=max_order),
+                    bleu.bleu_corpus_level(
+                        trans_corpus, self.reference_corpus, max_order=max_order
+                    ),
+                )
+        with self.assertRaises(ValueError):
+            bleu.bleu_corpus_level(trans_corpus, index, max_order=5)
+
+    def test_reference_index_vocabulary_does_not_grow(self):
+        index = bleu.ReferenceIndex(self.reference_corpus, max_order=4, engine="integer")
+        size = len(index.vocab.ids)
+        trans_corpus = load_translation_corpus(TRANS_FILES[0])
+        unseen = [segment + ["<never-seen-token>"] for segment in trans_corpus]
+        self.assertEqual(
+            bleu.bleu_statistics(unseen, index, max_order=4),
+            bleu.bleu_statistics(unseen, self.reference_corpus, max_order=4),
+        )
+        self.assertEqual(len(index.vocab.ids), size)
+
+    def test_corpus_level_iter(self):
+        for file in TRANS_FILES:
+            for engine in ("counter", "integer"):
+                self.assertEqual(
+                    bleu.bleu_corpus_level_iter(
+                        bleu.iter_corpus(file, REF_FILES), engine=engine
+                    ),
+                    bleu.bleu_corpus_level(
+                        load_translation_corpus(file), self.reference_corpus
+                    ),
+                )
+
+    def test_accumulator(self):
+        trans_corpus = [
+            "the cat sat on the mat".split(),
+            "a cat on the mat".split(),
+            "the the the".split(),
+        ]
+        reference_corpus = [
+            ["the cat is on the mat".split()],
+            ["there is a cat on the mat".split()],
+            ["the cat".split(), "a mat".split()],
+        ]
+        accumulator = bleu.BleuAccumulator(smooth=True)
+        ids = [accumulator.add(t, r) for t, r in zip(trans_corpus, reference_corpus)]
+        self.assertEqual(
+            accumulator.score(),
+            bleu.bleu_corpus_level(trans_corpus, reference_corpus, smooth=True),
+        )
+
+        accumulator.replace(ids[2], trans_corpus[0], reference_corpus[0])
+        accumulator.remove(ids[0])
+        self.assertEqual(
+            accumulator.score(),
+            bleu.bleu_corpus_level(trans_corpus[:2], reference_corpus[:2], smooth=True),
+        )
+
+        other = bleu.BleuAccumulator(smooth=True)
+        other.add(trans_corpus[2], reference_corpus[2], segment_id="extra")
+        accumulator.merge(other)
+        self.assertEqual(len(accumulator), 3)
+        with self.assertRaises(ValueError):
+            accumulator.merge(other)
+
+        restored = bleu.BleuAccumulator.from_dict(
+            json.loads(json.dumps(accumulator.to_dict()))
+        )
+        self.assertEqual(restored.score(), accumulator.score())
+        self.assertEqual(pickle.loads(pickle.dumps(accumulator)).score(), accumulator.score())
+
+    def test_accumulator_merge_default_ids(self):
+        trans_corpus = load_translation_corpus(TRANS_FILES[0]) + load_translation_corpus(
+            TRANS_FILES[1]
+        )
+        references = self.reference_corpus[0]
+        workers = [bleu.BleuAccumulator(), bleu.BleuAccumulator()]
+        for i, translation in enumerate(trans_corpus * 3):
+            workers[i % 2].add(translation, references)
+        workers[1].add(trans_corpus[0], references, segment_id="explicit")
+        merged = bleu.BleuAccumulator.from_dict(
+            json.loads(json.dumps(workers[0].to_dict()))
+        )
+        merged.merge(workers[1])
+        self.assertEqual(len(merged), 7)
+        self.assertIn("explicit", merged)
+        self.assertEqual(
+            merged.score(),
+            bleu.bleu_corpus_level(
+                trans_corpus * 3 + trans_corpus[:1], [references] * 7
+            ),
+        )
+        # The renumbered ids are still assigned ones.
+        merged.merge(workers[0])
+        self.assertEqual(len(merged), 10)
+
+    def test_accumulator_edge_cases(self):
+        accumulator = bleu.BleuAccumulator()
+        self.assertEqual(accumulator.score(), (0.0, 0.0, [0.0] * 4, 0.0))
+
+        segment_id = accumulator.add("a cat".split(), ["a cat".split()], segment_id=("doc", 1))
+        score = accumulator.score()
+        with self.assertRaises(ValueError):
+            accumulator.replace(segment_id, "a cat".split(), [])
+        self.assertIn(segment_id, accumulator)
+        self.assertEqual(accumulator.score(), score)
+
+        restored = bleu.BleuAccumulator.from_dict(
+            json.loads(json.dumps(accumulator.to_dict()))
+        )
+        self.assertIn(("doc", 1), restored)
+        restored.remove(("doc", 1))
+        self.assertEqual(len(restored), 0)
+
+    def test_sentence_level_batch(self):
+        references = [
+            ["the cat is on the mat".split(), "there is a cat on the mat".split()],
+            ["a dog is in the house".split()],
+        ]
+        samples = [
+            "the cat on the mat".split(),
+            "a dog in the house".split(),
+            "the the the".split(),
+            "a cat is on the mat".split(),
+        ]
+        source_ids = [0, 1, 0, 0]
+        expected = [
+            bleu.bleu_sentence_level(t, references[i], smooth=True)
+            for t, i in zip(samples, source_ids)
+        ]
+        scores = bleu.bleu_sentence_level_batch(
+            samples, references, source_ids, smooth=True
+        )
+        for score, expected_score in zip(scores, expected):
+            self.assertAlmostEqual(score, expected_score.bleu)
+        full_scores = bleu.bleu_sentence_level_batch(
+            samples, references, source_ids, smooth=True, full=True
+        )
+        self.assertEqual(len(full_scores), len(expected))
+        for score, expected_score in zip(full_scores, expected):
+            self.assertAlmostEqual(score.bleu, expected_score.bleu)
+            self.assertAlmostEqual(score.geo_mean, expected_score.geo_mean)
+            self.assertEqual(len(score.precisions), 4)
+            for precision, expected_precision in zip(
+                score.precisions, expected_score.precisions
+            ):
+                self.assertAlmostEqual(precision, expected_precision)
+        with self.assertRaises(ValueError):
+            bleu.bleu_sentence_level_batch(samples, references)
+
+    def test_sentence_level_batch_many_samples(self):
+        from bleu.metrics import _sentence_level_batch_python
+
+        samples = load_translation_corpus(TRANS_FILES[0]) + load_translation_corpus(
+            TRANS_FILES[1]
+        )
+        references = self.reference_corpus + [samples[::-1], ["the cat".split()]]
+        samples = samples * 4
+        source_ids = [0, 1, 1, 0, 0, 0, 1, 1]
+        for smooth in (False, True):
+            scores = bleu.bleu_sentence_level_batch(
+                samples, references, source_ids, smooth=smooth
+            )
+            python_scores = _sentence_level_batch_python(
+                samples, references, source_ids, 4, smooth, False
+            )
+            for sample, source_id, score, python_score in zip(
+                samples, source_ids, scores, python_scores
+            ):
+                expected = bleu.bleu_sentence_level(
+                    sample, references[source_id], smooth=smooth
+                ).bleu
+                self.assertAlmostEqual(score, expected)
+                self.assertEqual(python_score, expected)
+
+    def test_sentence_level_batch_empty_translation(self):
+        references = [["the cat is on the mat".split()]]
+        for smooth in (False, True):
+            scores = bleu.bleu_sentence_level_batch([[]], references, smooth=smooth)
+            self.assertEqual(list(scores), [0.0])
+            (score,) = bleu.bleu_sentence_level_batch(
+                [[]], references, smooth=smooth, full=True
+            )
+            self.assertEqual(score.bleu, 0.0)
+            self.assertEqual(score.brevity_penalty, 0.0)
+
+    def test_sentence_level_batch_without_numpy(self):
+        from bleu.metrics import _sentence_level_batch_python
+
+        references = [["the cat is on the mat".split()]]
+        samples = [[], "the cat on the mat".split()]
+        scores = _sentence_level_batch_python(samples, references, [0, 0], 4, True, False)
+        self.assertEqual(scores[0], 0.0)
+        self.assertEqual(
+            scores[1], bleu.bleu_sentence_level(samples[1], references[0], smooth=True).bleu
+        )
+        for score, python_score in zip(
+            bleu.bleu_sentence_level_batch(samples, references * 2, smooth=True), scores
+        ):
+            self.assertAlmostEqual(score, python_score)
@@ -0,0 +1,68 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+import bleu
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestNbest(unittest.TestCase):
+    candidates = [
+        "the cat sat on the mat".split(),
+        "the cat the cat the cat".split(),
+        "a cat sat on a mat".split(),
+        "on the mat sat the cat".split(),
+    ]
+    references = [
+        "the cat is on the mat".split(),
+        "there is a cat on the mat".split(),
+    ]
+
+    def test_bleu_matrix(self):
+        from bleu.nbest import nbest_bleu_matrix
+
+        matrix = nbest_bleu_matrix(self.candidates, self.references, smooth=True)
+        self.assertEqual(matrix.shape, (4, 2))
+        for i, candidate in enumerate(self.candidates):
+            for j, reference in enumerate(self.references):
+                self.assertAlmostEqual(
+                    matrix[i, j],
+                    bleu.bleu_sentence_level(candidate, [reference], smooth=True).bleu,
+                )
+
+    def test_pseudo_references(self):
+        from bleu.nbest import nbest_statistics
+
+        stats = nbest_statistics(self.candidates, max_order=3)
+        self.assertEqual(stats.shape, (4, 4, bleu.statistics_width(3)))
+        for i, candidate in enumerate(self.candidates):
+            for j, reference in enumerate(self.candidates):
+                self.assertEqual(
+                    stats[i, j].tolist(),
+                    list(bleu.bleu_statistics([candidate], [[reference]], max_order=3)),
+                )
@@ -0,0 +1,78 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import os
+import tempfile
+import unittest
+
+from bleu.output import NpyWriter, open_score_writer, write_scores
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TestOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_jsonl(self):
+        scores = [0.5, 0.25, [1.0, 0.5]]
+        # A small buffer makes several bulk writes.
+        with open_score_writer(self.path("s.jsonl"), "jsonl", buffer_size=2) as writer:
+            for score in scores:
+                writer.write(score)
+        with open(self.path("s.jsonl")) as f:
+            self.assertEqual([json.loads(line) for line in f], scores)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_npy(self):
+        self.assertEqual(
+            write_scores(self.path("s.npy"), (i / 4 for i in range(10)), "npy"), 10
+        )
+        scores = np.load(self.path("s.npy"), mmap_mode="r")
+        self.assertEqual(scores.dtype, np.float32)
+        self.assertEqual(scores.tolist(), [i / 4 for i in range(10)])
+
+        with NpyWriter(self.path("p.npy"), columns=2, buffer_size=1) as writer:
+            writer.write([0.5, 0.25])
+            writer.write([1.0, 0.0])
+            with self.assertRaises(ValueError):
+                writer.write([1.0])
+        self.assertEqual(np.load(self.path("p.npy")).tolist(), [[0.5, 0.25], [1.0, 0.0]])
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_empty_npy(self):
+        write_scores(self.path("e.npy"), [], "npy")
+        self.assertEqual(np.load(self.path("e.npy")).shape, (0,))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            open_score_writer(self.path("s.csv"), "csv")
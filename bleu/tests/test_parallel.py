@@ -0,0 +1,58 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+import bleu
+from bleu.tests.data import REF_FILES, TRANS_FILES
+from bleu.utils import load_reference_corpus, load_translation_corpus
+
+
+class TestParallel(unittest.TestCase):
+    # Repeat the test data so that it spans several chunks.
+    reference_corpus = load_reference_corpus(REF_FILES) * 7
+    translation_corpus = (
+        load_translation_corpus(TRANS_FILES[0]) + load_translation_corpus(TRANS_FILES[1])
+    ) * 3 + load_translation_corpus(TRANS_FILES[0])
+
+    def test_corpus_level(self):
+        self.assertEqual(
+            bleu.bleu_corpus_level(
+                self.translation_corpus, self.reference_corpus, workers=2, chunksize=2
+            ),
+            bleu.bleu_corpus_level(self.translation_corpus, self.reference_corpus),
+        )
+
+    def test_statistics_in_order(self):
+        self.assertEqual(
+            bleu.bleu_statistics(
+                self.translation_corpus, self.reference_corpus, workers=2, chunksize=3
+            ),
+            bleu.bleu_statistics(self.translation_corpus, self.reference_corpus),
+        )
+
+    def test_reference_index(self):
+        index = bleu.ReferenceIndex(self.reference_corpus, engine="integer")
+        self.assertEqual(
+            bleu.bleu_corpus_level(self.translation_corpus, index, workers=2, chunksize=2),
+            bleu.bleu_corpus_level(self.translation_corpus, self.reference_corpus),
+        )
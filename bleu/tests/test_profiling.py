@@ -0,0 +1,105 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+import bleu
+from bleu.profiling import Profiler
+from bleu.tests.data import REF_FILES, TRANS_FILES
+from bleu.utils import iter_corpus, load_reference_corpus, load_translation_corpus
+
+
+class TestProfiling(unittest.TestCase):
+    reference_corpus = load_reference_corpus(REF_FILES) * 2
+    translation_corpus = load_translation_corpus(TRANS_FILES[0]) + load_translation_corpus(
+        TRANS_FILES[1]
+    )
+
+    def test_counter_stages(self):
+        profiler = Profiler()
+        self.assertEqual(
+            bleu.bleu_corpus_level(
+                self.translation_corpus, self.reference_corpus, profiler=profiler
+            ),
+            bleu.bleu_corpus_level(self.translation_corpus, self.reference_corpus),
+        )
+        self.assertEqual(set(profiler.seconds), {"ngrams", "clipping", "scoring"})
+        self.assertEqual(profiler.counts["segments"], 2)
+        possible = sum(max(len(t) - n, 0) for t in self.translation_corpus for n in range(4))
+        self.assertEqual(profiler.counts["ngrams"], possible)
+
+    def test_engines(self):
+        for engine in bleu.metrics.ENGINES:
+            if engine == "numpy":
+                try:
+                    import numpy  # noqa: F401
+                except ImportError:
+                    continue
+            with self.subTest(engine=engine):
+                profiler = Profiler()
+                self.assertEqual(
+                    bleu.bleu_statistics(
+                        self.translation_corpus,
+                        self.reference_corpus,
+                        engine=engine,
+                        profiler=profiler,
+                    ),
+                    bleu.bleu_statistics(self.translation_corpus, self.reference_corpus),
+                )
+                self.assertEqual(profiler.counts["segments"], 2)
+                self.assertGreater(profiler.counts["ngrams"], 0)
+
+    def test_loaders_and_callback(self):
+        timings = []
+        profiler = Profiler(callback=lambda stage, seconds: timings.append(stage))
+        load_translation_corpus(file=TRANS_FILES[0], profiler=profiler)
+        load_reference_corpus(files=REF_FILES, profiler=profiler)
+        list(iter_corpus(TRANS_FILES[0], REF_FILES, profiler=profiler))
+        self.assertEqual(timings, ["load"] * 3)
+
+    def test_callback_once_per_stage(self):
+        timings = []
+        profiler = Profiler(callback=lambda stage, seconds: timings.append(stage))
+        bleu.bleu_statistics(
+            self.translation_corpus, self.reference_corpus, profiler=profiler
+        )
+        bleu.bleu_statistics(
+            self.translation_corpus,
+            self.reference_corpus,
+            engine="integer",
+            profiler=profiler,
+        )
+        self.assertEqual(timings, ["ngrams", "clipping", "statistics"])
+
+    def test_report(self):
+        profiler = Profiler(trace_memory=True)
+        try:
+            bleu.bleu_corpus_level_iter(
+                zip(self.translation_corpus, self.reference_corpus), profiler=profiler
+            )
+            report = profiler.report()
+        finally:
+            profiler.close()
+        self.assertIn("segments_per_second", report["throughput"])
+        self.assertIn("ngrams_per_second", report["throughput"])
+        self.assertIn("traced_python", report["peak_memory"])
+        self.assertIn("segments", profiler.format())
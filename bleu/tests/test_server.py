@@ -0,0 +1,158 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import json
+import unittest
+
+import bleu
+from bleu.server import ScoringServer, load_reference_sets, score_batch
+from bleu.tests.data import REF_FILES, TRANS_FILES
+from bleu.utils import load_reference_corpus, load_translation_corpus
+
+
+class TestServer(unittest.TestCase):
+    reference_corpus = load_reference_corpus(REF_FILES)
+    translations = load_translation_corpus(TRANS_FILES[0]) + load_translation_corpus(
+        TRANS_FILES[1]
+    )
+
+    def serve(self, requests, workers=0):
+        server = ScoringServer(load_reference_sets({"dev": REF_FILES}), workers=workers)
+
+        async def run():
+            return await asyncio.gather(*map(server.score, requests))
+
+        try:
+            return asyncio.run(run())
+        finally:
+            server.close()
+
+    def test_concurrent_requests(self):
+        requests = [
+            {"id": i, "references": "dev", "translations": [translation], "smooth": True}
+            for i, translation in enumerate(self.translations)
+        ]
+        requests.append(
+            {
+                "id": "both",
+                "references": "dev",
+                "translations": [" ".join(t) for t in self.translations],
+                "segments": [0, 0],
+                "level": "sentence",
+                "max_order": 2,
+            }
+        )
+        responses = self.serve(requests)
+        for i, translation in enumerate(self.translations):
+            self.assertEqual(responses[i]["id"], i)
+            self.assertEqual(
+                responses[i]["bleu"],
+                bleu.bleu_sentence_level(translation, self.reference_corpus[0], smooth=True).bleu,
+            )
+        self.assertEqual(
+            [score["bleu"] for score in responses[-1]["scores"]],
+            [
+                bleu.bleu_sentence_level(t, self.reference_corpus[0], max_order=2).bleu
+                for t in self.translations
+            ],
+        )
+
+    def test_workers(self):
+        request = {"id": 1, "references": "dev", "translations": [self.translations[1]]}
+        (response,) = self.serve([request], workers=1)
+        self.assertEqual(
+            response["bleu"],
+            bleu.bleu_corpus_level(self.translations[1:], self.reference_corpus).bleu,
+        )
+
+    def test_errors(self):
+        responses = self.serve(
+            [
+                {"id": 1, "references": "test", "translations": []},
+                {"id": 2, "references": "dev", "translations": ["a"], "segments": [1]},
+                {"id": 3, "references": "dev", "translations": ["a"], "max_order": 5},
+            ]
+        )
+        for i, response in enumerate(responses, 1):
+            self.assertEqual(response["id"], i)
+            self.assertIn("error", response)
+
+    def test_bad_request_does_not_stop_the_server(self):
+        server = ScoringServer(load_reference_sets({"dev": REF_FILES}))
+        good = {"id": "good", "references": "dev", "translations": [self.translations[0]]}
+
+        async def run():
+            responses = []
+            for bad in (
+                {"id": "empty", "references": "dev", "translations": [""]},
+                {"id": "order", "references": "dev", "translations": ["a"], "max_order": 0},
+            ):
+                responses.append(await asyncio.wait_for(server.score(bad), 5))
+                responses.append(await asyncio.wait_for(server.score(good), 5))
+            return responses
+
+        try:
+            responses = asyncio.run(run())
+        finally:
+            server.close()
+        self.assertEqual([r["id"] for r in responses], ["empty", "good", "order", "good"])
+        self.assertIn("error", responses[0])
+        self.assertIn("error", responses[2])
+        for response in responses[1::2]:
+            self.assertEqual(
+                response["bleu"],
+                bleu.bleu_corpus_level(self.translations[:1], self.reference_corpus).bleu,
+            )
+
+    def test_bad_request_in_a_batch(self):
+        good = {"id": "good", "references": "dev", "translations": [self.translations[0]]}
+        responses = self.serve(
+            [
+                good,
+                {"id": "int", "references": "dev", "translations": [5]},
+                {"id": "dict", "references": "dev", "translations": [["a", {"b": 1}]]},
+            ]
+        )
+        self.assertEqual([r["id"] for r in responses], ["good", "int", "dict"])
+        self.assertEqual(
+            responses[0]["bleu"],
+            bleu.bleu_corpus_level(self.translations[:1], self.reference_corpus).bleu,
+        )
+        for response in responses[1:]:
+            self.assertIn("a list of strings", response["error"])
+
+        # A task failing past the validation only fails its own result.
+        reference_sets = load_reference_sets({"dev": REF_FILES})
+        results = score_batch(
+            reference_sets, "dev", [([self.translations[0]], [0]), ([["a"]], [1])]
+        )
+        self.assertEqual(len(results[0]), 1)
+        self.assertIsInstance(results[1], IndexError)
+
+    def test_handle_line(self):
+        server = ScoringServer(load_reference_sets({"dev": REF_FILES}))
+        try:
+            response = asyncio.run(server.handle_line("[1]"))
+        finally:
+            server.close()
+        self.assertIn("error", json.loads(response))
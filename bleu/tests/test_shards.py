@@ -0,0 +1,89 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import os
+import tempfile
+import unittest
+
+import bleu
+from bleu.shards import merge_statistics, read_statistics, write_statistics
+from bleu.tests.data import REF_FILES, TRANS_FILES
+from bleu.utils import load_reference_corpus, load_translation_corpus
+
+
+class TestShards(unittest.TestCase):
+    reference_corpus = load_reference_corpus(REF_FILES)
+    translation_corpus = load_translation_corpus(TRANS_FILES[0]) + load_translation_corpus(
+        TRANS_FILES[1]
+    )
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_shards(self, orders, segments):
+        paths = []
+        for i, (translation, order) in enumerate(zip(self.translation_corpus, orders)):
+            path = os.path.join(self.tmpdir.name, "shard-%d.json" % i)
+            stats = bleu.bleu_statistics([translation], self.reference_corpus, max_order=order)
+            write_statistics(path, stats, order, segments=segments, metadata={"shard": i})
+            paths.append(path)
+        return paths
+
+    def test_merge_is_exact(self):
+        merged = merge_statistics(self.write_shards([4, 4], segments=True))
+        corpus = self.translation_corpus
+        references = self.reference_corpus * 2
+        self.assertEqual(merged.n_segments, 2)
+        self.assertEqual(merged.metadata, {"shards": [{"shard": 0}, {"shard": 1}]})
+        self.assertEqual(
+            bleu.bleu_from_statistics(merged.totals),
+            bleu.bleu_corpus_level(corpus, references),
+        )
+        self.assertEqual(merged.rows, bleu.bleu_statistics(corpus, references))
+
+    def test_merge_truncates_orders(self):
+        merged = merge_statistics(self.write_shards([4, 2], segments=False))
+        self.assertEqual(merged.max_order, 2)
+        self.assertIsNone(merged.rows)
+        self.assertEqual(
+            bleu.bleu_from_statistics(merged.totals, smooth=True),
+            bleu.bleu_corpus_level(
+                self.translation_corpus, self.reference_corpus * 2, max_order=2, smooth=True
+            ),
+        )
+        with self.assertRaises(ValueError):
+            merge_statistics(self.write_shards([4, 2], segments=False), max_order=3)
+
+    def test_version(self):
+        (path,) = self.write_shards([4], segments=False)
+        self.assertEqual(read_statistics(path).n_segments, 1)
+        with open(path) as f:
+            content = json.load(f)
+        content["version"] = 2
+        with open(path, "w") as f:
+            json.dump(content, f)
+        with self.assertRaises(ValueError):
+            read_statistics(path)
@@ -0,0 +1,73 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import random
+import unittest
+
+import bleu
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _make_corpus(seed, n_segments=50):
+    rng = random.Random(seed)
+    vocab = "the a cat dog sat on mat rug is was".split()
+    references = [
+        [[rng.choice(vocab) for _ in range(rng.randint(5, 12))]] for _ in range(n_segments)
+    ]
+    return references
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestSignificance(unittest.TestCase):
+    references = _make_corpus(0)
+    # System a copies the references, system b is shuffled.
+    good = [refs[0][:] for refs in references]
+    bad = [random.Random(i).sample(refs[0], len(refs[0])) for i, refs in enumerate(references)]
+
+    def test_bootstrap_bleu(self):
+        from bleu.significance import bootstrap_bleu
+
+        stats = bleu.bleu_statistics(self.bad, self.references)
+        result = bootstrap_bleu(stats, smooth=True, n_samples=200, seed=1)
+        self.assertEqual(
+            result.score, bleu.bleu_corpus_level(self.bad, self.references, smooth=True)
+        )
+        self.assertLessEqual(result.low, result.score.bleu)
+        self.assertGreaterEqual(result.high, result.score.bleu)
+        self.assertEqual(result, bootstrap_bleu(stats, smooth=True, n_samples=200, seed=1))
+
+    def test_paired_bootstrap(self):
+        from bleu.significance import paired_bootstrap
+
+        stats_good = bleu.bleu_statistics(self.good, self.references)
+        stats_bad = bleu.bleu_statistics(self.bad, self.references)
+        result = paired_bootstrap(stats_good, stats_bad, smooth=True, n_samples=200, seed=1)
+        self.assertGreater(result.delta, 0)
+        self.assertLess(result.p_value, 0.05)
+
+        result = paired_bootstrap(stats_bad, stats_bad, smooth=True, n_samples=200, seed=1)
+        self.assertEqual(result.delta, 0)
+        self.assertEqual(result.p_value, 1.0)
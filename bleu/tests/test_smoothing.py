@@ -0,0 +1,102 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+import bleu
+from bleu.tests.data import REF_FILES, TRANS_FILES
+from bleu.utils import load_reference_corpus, load_translation_corpus
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestSmoothing(unittest.TestCase):
+    reference_corpus = load_reference_corpus(REF_FILES) * 4
+    translation_corpus = (
+        load_translation_corpus(TRANS_FILES[0])
+        + load_translation_corpus(TRANS_FILES[1])
+        # No match at all, and too short for the higher orders.
+        + [["zz"], ["It", "is", "a"]]
+    )
+
+    def setUp(self):
+        from bleu.smoothing import smoothing_sweep
+
+        self.stats = bleu.bleu_statistics(self.translation_corpus, self.reference_corpus)
+        self.sweep = smoothing_sweep(self.stats, max_order=4, orders=[1, 2, 4])
+
+    def test_shapes(self):
+        from bleu.smoothing import SMOOTHING_METHODS
+
+        self.assertEqual(self.sweep.methods, list(SMOOTHING_METHODS))
+        self.assertEqual(self.sweep.sentence.shape, (len(SMOOTHING_METHODS), 3, 4))
+        self.assertEqual(self.sweep.corpus.shape, (len(SMOOTHING_METHODS), 3))
+
+    def test_same_as_bleu_from_statistics(self):
+        for method, smooth in (("none", False), ("add-one", True)):
+            i = self.sweep.methods.index(method)
+            for j, order in enumerate(self.sweep.orders):
+                stats = bleu.truncate_statistics(self.stats, 4, order)
+                np.testing.assert_allclose(
+                    self.sweep.sentence[i, j],
+                    [
+                        score.bleu
+                        for score in bleu.sentence_scores_from_statistics(stats, order, smooth)
+                    ],
+                    rtol=1e-12,
+                )
+                self.assertAlmostEqual(
+                    self.sweep.corpus[i, j],
+                    bleu.bleu_from_statistics(bleu.sum_statistics(stats, order), smooth).bleu,
+                )
+
+    def test_methods(self):
+        from bleu.smoothing import FLOOR_EPSILON, smooth_precisions
+
+        matches = [[3, 0, 0, 0]]
+        possible = [[4, 3, 2, 0]]
+        np.testing.assert_allclose(
+            smooth_precisions(matches, possible, "floor"),
+            [[0.75, FLOOR_EPSILON / 3, FLOOR_EPSILON / 2, 0.0]],
+        )
+        np.testing.assert_allclose(
+            smooth_precisions(matches, possible, "exp-decay"), [[0.75, 1 / 6, 1 / 8, 0.0]]
+        )
+        np.testing.assert_allclose(
+            smooth_precisions(matches, possible, "add-one-higher"),
+            [[0.75, 1 / 4, 1 / 3, 1.0]],
+        )
+        with self.assertRaises(ValueError):
+            smooth_precisions(matches, possible, "add-two")
+
+    def test_empty_rows(self):
+        from bleu.smoothing import smoothing_sweep
+
+        # An empty translation, an empty reference, and both.
+        rows = [[0, 3, 0, 0, 0, 0], [2, 0, 1, 0, 2, 1], [0, 0, 0, 0, 0, 0]]
+        sweep = smoothing_sweep(rows, max_order=2)
+        np.testing.assert_array_equal(sweep.sentence, 0.0)
+        self.assertFalse(np.isnan(sweep.corpus).any())
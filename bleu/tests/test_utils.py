@@ -20,10 +20,12 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import os
+import tempfile
 import unittest
 
 from bleu.tests.data import TRANS_FILES, REF_FILES, N_TEST_REF
-from bleu.utils import load_translation_corpus, load_reference_corpus
+from bleu.utils import iter_corpus, load_translation_corpus, load_reference_corpus
 
 
 class TestUtils(unittest.TestCase):
@@ -38,3 +40,37 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(len(ref_corpus), 1, msg="ref_corpus for only one trans")
         refs = ref_corpus[0]
         self.assertEqual(len(refs), N_TEST_REF, msg="3 references for one trans")
+
+    def test_iter_corpus(self):
+        for file in TRANS_FILES:
+            segments = list(iter_corpus(file, REF_FILES))
+            self.assertEqual(
+                segments,
+                list(
+                    zip(load_translation_corpus(file), load_reference_corpus(REF_FILES))
+                ),
+            )
+
+    def test_iter_corpus_mismatch(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            short_ref = os.path.join(tmpdir, "short_ref.txt")
+            trans = os.path.join(tmpdir, "trans.txt")
+            with open(short_ref, "w") as f:
+                f.write("a b c\n")
+            with open(trans, "w") as f:
+                f.write("a b c\nd e f\n")
+            with self.assertRaisesRegex(ValueError, "short_ref.txt"):
+                list(iter_corpus(trans, [short_ref]))
+
+    def test_iter_corpus_strips_references(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ref = os.path.join(tmpdir, "ref.txt")
+            trans = os.path.join(tmpdir, "trans.txt")
+            with open(ref, "w") as f:
+                f.write("\na b c d\n\ne f g h\n\n")
+            with open(trans, "w") as f:
+                f.write("a b c\n\nd e f\n")
+            self.assertEqual(
+                list(iter_corpus(trans, [ref])),
+                list(zip(load_translation_corpus(trans), load_reference_corpus([ref]))),
+            )
@@ -0,0 +1,108 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+
+import bleu
+from bleu.tests.data import REF_FILES, TRANS_FILES
+from bleu.utils import load_reference_corpus, load_translation_corpus
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestVectorized(unittest.TestCase):
+    reference_corpus = load_reference_corpus(REF_FILES)
+    translation_corpus = [
+        "the cat the cat on the mat".split(),
+        "there is a cat on the mat".split(),
+        "a".split(),
+    ]
+    references = [
+        ["the cat is on the mat".split(), "there is a cat on the mat".split()],
+        ["a cat is on the mat".split()],
+        ["b".split(), "a a".split(), "c c c".split()],
+    ]
+
+    def test_same_statistics(self):
+        from bleu.vectorized import corpus_statistics, encode_corpus
+
+        encoded = encode_corpus(self.translation_corpus, self.references)
+        for max_order in (1, 2, 4):
+            self.assertEqual(
+                corpus_statistics(encoded, max_order).ravel().tolist(),
+                bleu.bleu_statistics(
+                    self.translation_corpus, self.references, max_order
+                ).tolist(),
+            )
+
+    def test_batch_statistics(self):
+        from bleu.vectorized import batch_statistics
+
+        samples = self.translation_corpus * 3 + [[]]
+        # Several samples per source, out of order, and source 1 left out.
+        source_ids = [2, 0, 2, 0, 0, 2, 2, 0, 2, 0]
+        for max_order in (1, 2, 4):
+            self.assertEqual(
+                batch_statistics(samples, self.references, source_ids, max_order)
+                .ravel()
+                .tolist(),
+                bleu.bleu_statistics(
+                    samples, [self.references[i] for i in source_ids], max_order
+                ).tolist(),
+            )
+
+    def test_numpy_engine(self):
+        for file in TRANS_FILES:
+            trans_corpus = load_translation_corpus(file)
+            for smooth in (False, True):
+                self.assertEqual(
+                    bleu.bleu_corpus_level(
+                        trans_corpus, self.reference_corpus, smooth=smooth, engine="numpy"
+                    ),
+                    bleu.bleu_corpus_level(
+                        trans_corpus, self.reference_corpus, smooth=smooth
+                    ),
+                )
+
+    def test_bleu_from_statistics_array(self):
+        from bleu.vectorized import bleu_from_statistics_array
+
+        stats = bleu.bleu_statistics(self.translation_corpus, self.references)
+        matrix = np.array(stats).reshape(len(self.translation_corpus), -1)
+        for smooth in (False, True):
+            scores = bleu_from_statistics_array(matrix, smooth)
+            expected = bleu.sentence_scores_from_statistics(stats, smooth=smooth)
+            np.testing.assert_allclose(scores.bleu, [s.bleu for s in expected])
+            np.testing.assert_allclose(
+                scores.precisions, [s.precisions for s in expected]
+            )
+
+    def test_ragged_from_padded(self):
+        from bleu.vectorized import ragged_from_padded
+
+        ids, offsets = ragged_from_padded([[1, 2, 0], [3, 0, 0], [4, 5, 6]])
+        self.assertEqual(ids.tolist(), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(offsets.tolist(), [0, 2, 3, 6])
@@ -20,13 +20,22 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import contextlib
+import itertools
+import time
+
 __all__ = [
     "load_reference_corpus",
     "load_translation_corpus",
+    "iter_corpus",
+    "iter_stripped_lines",
 ]
 
 
-def load_reference_corpus(files):
+def load_reference_corpus(files, profiler=None):
+    if profiler is not None:
+        with profiler.stage("load"):
+            return load_reference_corpus(files)
     references = None
     for file in files:
         with open(file) as f:
@@ -41,6 +50,81 @@ def load_reference_corpus(files):
     return references
 
 
-def load_translation_corpus(file):
+def load_translation_corpus(file, profiler=None):
+    if profiler is not None:
+        with profiler.stage("load"):
+            return load_translation_corpus(file)
     with open(file) as f:
         return [line.split() for line in f.readlines()]
+
+
+def iter_stripped_lines(f):
+    """Yields the lines of a file as load_reference_corpus() splits them.
+
+    That is the lines of the text stripped of its leading and trailing whitespace,
+    without holding the text in memory.
+    """
+    started = False
+    blank = 0
+    for line in f:
+        line = line.rstrip("\n")
+        if not line.strip():
+            if started:
+                blank += 1
+            continue
+        if started:
+            for _ in range(blank):
+                yield ""
+        blank = 0
+        started = True
+        yield line
+    if not started:
+        yield ""
+
+
+def iter_corpus(translation_file, reference_files, profiler=None):
+    """Reads a translation file and its reference files line by line in lockstep.
+
+    Only the current line of each file is held in memory. The reference files are
+    stripped as by load_reference_corpus(), the translation file is read as by
+    load_translation_corpus().
+
+    Args:
+        translation_file: path of the translation file.
+        reference_files: list of paths of the reference files.
+        profiler: a bleu.profiling.Profiler to record the reading time with.
+
+    Yields:
+        A (translation, references) pair for each line, in the format expected
+        by bleu_corpus_level_iter().
+
+    Raises:
+        ValueError: when the files do not have the same number of lines. This is only
+            found out when the shortest file is exhausted.
+    """
+    files = [translation_file] + list(reference_files)
+    with contextlib.ExitStack() as stack:
+        streams = [stack.enter_context(open(translation_file))] + [
+            iter_stripped_lines(stack.enter_context(open(file))) for file in reference_files
+        ]
+        clock = time.perf_counter
+        # The reading time is summed here and reported once, when the files are closed.
+        seconds = 0.0
+        try:
+            start = clock()
+            for lineno, lines in enumerate(itertools.zip_longest(*streams), 1):
+                if None in lines:
+                    ended = [str(file) for file, line in zip(files, lines) if line is None]
+                    raise ValueError(
+                        "%s ended at line %d, before the other files"
+                        % (", ".join(ended), lineno - 1)
+                    )
+                segment = lines[0].split(), [line.split() for line in lines[1:]]
+                if profiler is not None:
+                    seconds += clock() - start
+                yield segment
+                if profiler is not None:
+                    start = clock()
+        finally:
+            if profiler is not None:
+                profiler.add_time("load", seconds)
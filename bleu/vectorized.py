@@ -0,0 +1,381 @@
+# MIT License
+# 
+# Copyright (c) 2019 Cong Feng.
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""NumPy backend of BLEU over token-id arrays.
+
+A corpus is held as ragged arrays: the token ids of all segments concatenated
+into one flat array, plus an array of offsets delimiting the segments. The n-grams
+of each order are read off strided windows of the flat array, each code extending
+that of its prefix with one more id. Codes are only renumbered densely, by an
+argsort, when they would come near the int64 limit, which the small vocabularies
+of most corpora never reach. Counting and clipping are then done in bulk across
+the whole corpus by sorting the codes and reducing the runs of equal ones, and the
+scores are computed on arrays.
+
+NumPy is an optional dependency and is only needed when this module is used.
+"""
+
+import collections
+import itertools
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from bleu.integer import Vocabulary
+from bleu.metrics import (
+    DEFAULT_MAX_ORDER,
+    BleuScore,
+    bleu_from_statistics,
+    statistics_width,
+)
+
+__all__ = [
+    "EncodedCorpus",
+    "encode_corpus",
+    "ragged_from_padded",
+    "corpus_statistics",
+    "batch_statistics",
+    "bleu_from_statistics_array",
+    "bleu_corpus_level_numpy",
+]
+
+# Hold a translation corpus and its references as ragged arrays of token ids.
+# References of all segments are concatenated, and ref_segments[i] is the index
+# of the translation the i-th reference belongs to.
+EncodedCorpus = collections.namedtuple(
+    "EncodedCorpus",
+    ["hyp_ids", "hyp_offsets", "ref_ids", "ref_offsets", "ref_segments"],
+)
+
+
+def _encode_segments(segments, vocab):
+    lengths = np.fromiter(map(len, segments), dtype=np.int64, count=len(segments))
+    offsets = np.zeros(len(segments) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    tokens = list(itertools.chain.from_iterable(segments))
+    ids = np.asarray(vocab.encode(tokens), dtype=np.int64)
+    return ids, offsets
+
+
+def encode_corpus(translation_corpus, reference_corpus, vocab=None):
+    """Encodes tokenized corpora into an EncodedCorpus.
+
+    Args:
+        translation_corpus: list of translations, as in bleu_corpus_level().
+        reference_corpus: list of lists of references, as in bleu_corpus_level().
+        vocab: a bleu.integer.Vocabulary to intern the tokens with.
+
+    Returns:
+        An EncodedCorpus.
+    """
+    if len(translation_corpus) != len(reference_corpus):
+        raise ValueError(
+            "translation_corpus has %d segments but reference_corpus has %d"
+            % (len(translation_corpus), len(reference_corpus))
+        )
+    vocab = vocab or Vocabulary()
+    hyp_ids, hyp_offsets = _encode_segments(translation_corpus, vocab)
+    references = [r for refs in reference_corpus for r in refs]
+    ref_ids, ref_offsets = _encode_segments(references, vocab)
+    ref_segments = np.repeat(
+        np.arange(len(reference_corpus), dtype=np.int64),
+        np.fromiter(map(len, reference_corpus), dtype=np.int64, count=len(reference_corpus)),
+    )
+    return EncodedCorpus(hyp_ids, hyp_offsets, ref_ids, ref_offsets, ref_segments)
+
+
+def ragged_from_padded(padded, pad_id=0):
+    """Turns a 2-D array of token ids padded on the right into (ids, offsets)."""
+    padded = np.asarray(padded)
+    mask = padded != pad_id
+    lengths = mask.sum(axis=1)
+    offsets = np.zeros(len(padded) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return padded[mask].astype(np.int64), offsets
+
+
+# Keys are kept below this bound so that the int64 arithmetic never overflows.
+_KEY_LIMIT = 1 << 62
+
+
+def _group_starts(sorted_keys):
+    """Returns the index where each run of equal keys starts in sorted_keys."""
+    flags = np.empty(len(sorted_keys), dtype=bool)
+    flags[:1] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=flags[1:])
+    return np.flatnonzero(flags)
+
+
+def _count_keys(keys):
+    """Same as np.unique(keys, return_counts=True), but faster on large arrays."""
+    keys = np.sort(keys)
+    starts = _group_starts(keys)
+    return keys[starts], np.diff(np.append(starts, len(keys)))
+
+
+def _densify(codes):
+    """Renumbers codes to 0, 1, 2, ... keeping equal codes equal."""
+    order = np.argsort(codes)
+    starts = _group_starts(codes[order])
+    ranks = np.zeros(len(codes), dtype=np.int64)
+    ranks[starts[1:]] = 1
+    dense = np.empty(len(codes), dtype=np.int64)
+    dense[order] = np.cumsum(ranks)
+    return dense
+
+
+def _iter_ngram_codes(ids, lengths, max_order, n_groups):
+    """Yields (order, codes, valid) for every order of the segments of a flat array.
+
+    codes[i] is the code of the n-gram starting at position i, and valid[i] tells
+    whether it fits in its segment. The codes stay small enough to be combined with
+    a group number below n_groups without overflow.
+    """
+    n_tokens = len(ids)
+    room = np.repeat(np.cumsum(lengths), lengths) - np.arange(n_tokens)
+    # Pad so that every position has a full window of max_order ids.
+    windows = sliding_window_view(
+        np.concatenate([ids, np.zeros(max_order, dtype=np.int64)]), max_order
+    )[:n_tokens]
+
+    base = int(ids.max()) + 1 if n_tokens else 1
+    codes = windows[:, 0]
+    n_codes = base
+    for order in range(1, max_order + 1):
+        if order > 1:
+            if n_codes * base >= _KEY_LIMIT:
+                codes = _densify(codes)
+                n_codes = int(codes.max()) + 1
+            # The code of an n-gram extends that of its prefix with its last id.
+            codes = codes * base + windows[:, order - 1]
+            n_codes *= base
+        if n_codes * n_groups >= _KEY_LIMIT:
+            codes = _densify(codes)
+            n_codes = int(codes.max()) + 1
+        yield order, codes, room >= order
+
+
+def corpus_statistics(encoded, max_order=None):
+    """Computes the sufficient statistics of every segment of an EncodedCorpus.
+
+    The references of a segment must be contiguous in the EncodedCorpus and appear
+    in the order of the segments, which is how encode_corpus() lays them out.
+
+    Returns:
+        An int64 array of shape (n_segments, statistics_width(max_order)), each row
+        laid out as in bleu.metrics.statistics_width().
+    """
+    max_order = max_order or DEFAULT_MAX_ORDER
+    hyp_ids, hyp_offsets, ref_ids, ref_offsets, ref_segments = encoded
+    n_segments = len(hyp_offsets) - 1
+    n_references = len(ref_offsets) - 1
+    stats = np.zeros((n_segments, statistics_width(max_order)), dtype=np.int64)
+    if not n_segments:
+        return stats
+
+    hyp_lengths = np.diff(hyp_offsets)
+    ref_lengths = np.diff(ref_offsets)
+    ref_starts = np.searchsorted(ref_segments, np.arange(n_segments))
+    stats[:, 0] = hyp_lengths
+    stats[:, 1] = np.minimum.reduceat(ref_lengths, ref_starts)
+    for order in range(1, max_order + 1):
+        stats[:, 1 + max_order + order] = np.maximum(hyp_lengths - order + 1, 0)
+
+    # Every position is tagged with the group it belongs to: a segment and a slot,
+    # slot 0 being the translation and slot i the i-th reference of the segment.
+    n_slots = 1 + int(np.bincount(ref_segments, minlength=n_segments).max())
+    n_groups = n_segments * n_slots
+    ref_slots = np.arange(n_references) - ref_starts[ref_segments] + 1
+    group = np.concatenate(
+        [
+            np.repeat(np.arange(n_segments, dtype=np.int64) * n_slots, hyp_lengths),
+            np.repeat(ref_segments * n_slots + ref_slots, ref_lengths),
+        ]
+    )
+    # Code the n-grams of translations and references together so they are comparable.
+    for order, codes, valid in _iter_ngram_codes(
+        np.concatenate([hyp_ids, ref_ids]),
+        np.concatenate([hyp_lengths, ref_lengths]),
+        max_order,
+        n_groups,
+    ):
+        keys, counts = _count_keys(codes[valid] * n_groups + group[valid])
+        if not len(keys):
+            continue
+        # Sorted keys put the slots of the same n-gram in the same segment together.
+        ngrams = keys // n_slots
+        slots = keys % n_slots
+        starts = np.flatnonzero(np.r_[True, ngrams[1:] != ngrams[:-1]])
+        max_ref_counts = np.maximum.reduceat(np.where(slots > 0, counts, 0), starts)
+        hyp_counts = np.where(slots[starts] == 0, counts[starts], 0)
+        stats[:, 1 + order] = np.bincount(
+            ngrams[starts] % n_segments,
+            weights=np.minimum(hyp_counts, max_ref_counts),
+            minlength=n_segments,
+        ).astype(np.int64)
+    return stats
+
+
+def batch_statistics(translation_sentences, reference_corpus, source_ids, max_order=None):
+    """Computes the sufficient statistics of translations sharing references.
+
+    Unlike corpus_statistics(), the references of a source are encoded and counted
+    once however many translations are scored against them, e.g. many samples of
+    the same source.
+
+    Args:
+        translation_sentences: list of translations, each a list of tokens.
+        reference_corpus: list of lists of references, one list per source.
+        source_ids: source_ids[i] is the index in reference_corpus of the references
+            of the i-th translation.
+        max_order: Maximum n-gram order to collect statistics for.
+
+    Returns:
+        An int64 array of shape (n_translations, statistics_width(max_order)).
+    """
+    max_order = max_order or DEFAULT_MAX_ORDER
+    n_hyps = len(translation_sentences)
+    stats = np.zeros((n_hyps, statistics_width(max_order)), dtype=np.int64)
+    if not n_hyps:
+        return stats
+    # Only the sources of the batch are encoded, numbered densely.
+    sources, hyp_sources = np.unique(
+        np.asarray(source_ids, dtype=np.int64), return_inverse=True
+    )
+    n_sources = len(sources)
+    references = [reference_corpus[source] for source in sources.tolist()]
+
+    vocab = Vocabulary()
+    hyp_ids, hyp_offsets = _encode_segments(translation_sentences, vocab)
+    ref_ids, ref_offsets = _encode_segments([r for refs in references for r in refs], vocab)
+    ref_sources = np.repeat(
+        np.arange(n_sources, dtype=np.int64),
+        np.fromiter(map(len, references), dtype=np.int64, count=n_sources),
+    )
+    hyp_lengths = np.diff(hyp_offsets)
+    ref_lengths = np.diff(ref_offsets)
+    n_references = len(ref_lengths)
+    ref_starts = np.searchsorted(ref_sources, np.arange(n_sources))
+    stats[:, 0] = hyp_lengths
+    stats[:, 1] = np.minimum.reduceat(ref_lengths, ref_starts)[hyp_sources]
+    for order in range(1, max_order + 1):
+        stats[:, 1 + max_order + order] = np.maximum(hyp_lengths - order + 1, 0)
+
+    # Every position is tagged with its translation, or its reference.
+    n_groups = max(n_hyps, n_references)
+    group = np.concatenate(
+        [
+            np.repeat(np.arange(n_hyps, dtype=np.int64), hyp_lengths),
+            np.repeat(np.arange(n_references, dtype=np.int64), ref_lengths),
+        ]
+    )
+    is_hyp = np.arange(len(group)) < len(hyp_ids)
+    for order, codes, valid in _iter_ngram_codes(
+        np.concatenate([hyp_ids, ref_ids]),
+        np.concatenate([hyp_lengths, ref_lengths]),
+        max_order,
+        n_groups,
+    ):
+        ref_valid = valid & ~is_hyp
+        keys, counts = _count_keys(codes[ref_valid] * n_references + group[ref_valid])
+        if not len(keys):
+            continue
+        # The references of a source are contiguous, so the keys of the same n-gram
+        # in the same source stay together once sorted: take the max over them.
+        ref_keys = keys // n_references * n_sources + ref_sources[keys % n_references]
+        starts = _group_starts(ref_keys)
+        ref_keys = ref_keys[starts]
+        max_ref_counts = np.maximum.reduceat(counts, starts)
+
+        hyp_valid = valid & is_hyp
+        keys, counts = _count_keys(codes[hyp_valid] * n_hyps + group[hyp_valid])
+        hyps = keys % n_hyps
+        lookup = keys // n_hyps * n_sources + hyp_sources[hyps]
+        found = np.minimum(np.searchsorted(ref_keys, lookup), len(ref_keys) - 1)
+        clipped = np.where(
+            ref_keys[found] == lookup, np.minimum(counts, max_ref_counts[found]), 0
+        )
+        stats[:, 1 + order] = np.bincount(hyps, weights=clipped, minlength=n_hyps).astype(
+            np.int64
+        )
+    return stats
+
+
+def bleu_from_statistics_array(stats, smooth=False):
+    """Computes BLEU of every row of a statistics array at once.
+
+    The arithmetic is the same as in bleu.metrics.bleu_from_statistics(), but the
+    results may differ from it in the last bits as NumPy has its own log and exp.
+
+    Returns:
+        A BleuScore whose fields are arrays: bleu, geo_mean and brevity_penalty are of
+        shape (n_rows,) and precisions is of shape (n_rows, max_order).
+    """
+    stats = np.atleast_2d(stats)
+    max_order = (stats.shape[1] - 2) // 2
+    translation_length = stats[:, 0].astype(np.float64)
+    reference_length = stats[:, 1].astype(np.float64)
+    matches = stats[:, 2 : 2 + max_order].astype(np.float64)
+    possible_matches = stats[:, 2 + max_order :].astype(np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if smooth:
+            precisions = (matches + 1.0) / (possible_matches + 1.0)
+        else:
+            precisions = np.where(
+                possible_matches > 0, matches / np.maximum(possible_matches, 1.0), 0.0
+            )
+        positive = precisions.min(axis=1) > 0
+        log_precisions = np.log(np.where(positive[:, None], precisions, 1.0))
+        p_log_sum = ((1.0 / max_order) * log_precisions).sum(axis=1)
+        geo_mean = np.where(positive, np.exp(p_log_sum), 0.0)
+
+        ratio = translation_length / reference_length
+        bp = np.where(ratio > 1.0, 1.0, np.exp(1 - 1.0 / ratio))
+
+    return BleuScore(
+        bleu=geo_mean * bp, geo_mean=geo_mean, precisions=precisions, brevity_penalty=bp
+    )
+
+
+def bleu_corpus_level_numpy(
+    translation_corpus, reference_corpus, max_order=None, smooth=False
+):
+    """Computes corpus level BLEU with the NumPy backend.
+
+    Args:
+        translation_corpus: list of translations, as in bleu_corpus_level().
+        reference_corpus: list of lists of references, as in bleu_corpus_level().
+            An EncodedCorpus can be passed as translation_corpus, with reference_corpus
+            left to None.
+        max_order: Maximum n-gram order to use when computing BLEU score.
+        smooth: Whether or not to apply Lin et al. 2004 smoothing.
+
+    Returns:
+        A BleuScore, identical to that of bleu_corpus_level().
+    """
+    if isinstance(translation_corpus, EncodedCorpus):
+        encoded = translation_corpus
+    else:
+        encoded = encode_corpus(translation_corpus, reference_corpus)
+    stats = corpus_statistics(encoded, max_order)
+    return bleu_from_statistics(stats.sum(axis=0).tolist(), smooth)
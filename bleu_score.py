@@ -16,9 +16,30 @@
 """Driver script to compute BLEU score."""
 
 import argparse
+import array
+import concurrent.futures
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
 from pathlib import Path
 
 from bleu import *
+from bleu.binary import binary_statistics
+from bleu.binary import cached_corpus
+from bleu.cache import StatisticsCache
+from bleu.cache import cached_statistics
+from bleu.metrics import STATISTICS_TYPECODE
+from bleu.loader import load_encoded_corpus
+from bleu.output import SCORE_FORMATS
+from bleu.output import open_score_writer
+from bleu.profiling import Profiler
+from bleu.shards import merge_statistics
+from bleu.shards import write_statistics
+from bleu.utils import iter_corpus
 from bleu.utils import load_reference_corpus
 from bleu.utils import load_translation_corpus
 from agenda.metric_helper import write_score
@@ -50,53 +71,541 @@ def _read_references(ref_files, n_trans):
     return references
 
 
-def eval_metric(translations, references, n, type, output_dir):
-    name = 'bleu_%d' % n
+def _cached_corpus(files, cache_dir):
+    """
+    Open the binary cache of some files in cache_dir, compiling it if needed.
+    :param files: List[string].
+    :param cache_dir: string.
+    :return: BinaryCorpus.
+    """
+    key = hashlib.sha1('\n'.join(map(os.path.abspath, files)).encode('utf-8')).hexdigest()
+    os.makedirs(cache_dir, exist_ok=True)
+    return cached_corpus(files, os.path.join(cache_dir, key + '.bin'))
+
+
+def _statistics_cache(args):
+    """
+    Open the statistics cache of the command line.
+    :param args: the parsed command line.
+    :return: StatisticsCache.
+    """
+    max_bytes = None
+    if args.stats_cache_size is not None:
+        max_bytes = int(args.stats_cache_size * 2 ** 20)
+    return StatisticsCache(args.stats_cache, max_bytes=max_bytes)
+
+
+def _metric_name(n, smooth):
+    """
+    Name the output of an order, the unsmoothed variant having a suffix.
+    :param n: int.
+    :param smooth: bool.
+    :return: string.
+    """
+    return 'bleu_%d' % n if smooth else 'bleu_%d_nosmooth' % n
+
+
+def eval_metric(stats, max_order, n, type, output_dir, profiler=None):
+    """
+    Write the smoothed scores of order n to bleu_n.json and the unsmoothed ones to
+    bleu_n_nosmooth.json, both from the same statistics.
+    :return: float, the smoothed system score.
+    """
+    if profiler is not None:
+        with profiler.stage('write'):
+            return eval_metric(stats, max_order, n, type, output_dir)
+    output_dir = Path(output_dir)
+
+    # The statistics of order n are a slice of those of max_order.
+    stats = truncate_statistics(stats, max_order=max_order, order=n)
+    totals = sum_statistics(stats, max_order=n)
+
+    systems = {}
+    for smooth in (True, False):
+        name = _metric_name(n, smooth)
+        scores = [
+            getattr(score, type)
+            for score in sentence_scores_from_statistics(stats, max_order=n, smooth=smooth)
+        ]
+        systems[smooth] = getattr(bleu_from_statistics(totals, smooth=smooth), type)
+
+        write_score(
+            name=name,
+            scores=scores,
+            system=systems[smooth],
+            output=output_dir.joinpath(name).with_suffix('.json'),
+            params={
+                'type': type,
+                'n': n,
+                'smooth': smooth,
+            }
+        )
+    return systems[True]
+
+
+def eval_metrics_streaming(rows, max_order, n_grams, type, output_dir, format, profiler=None):
+    """
+    Score every segment for all orders in one pass, appending the sentence scores to
+    a file per order as they come, so that no list of scores is kept in memory.
+    The system score of order n is written to bleu_n.json as by eval_metric(), its
+    sentence scores to bleu_n.jsonl or bleu_n.npy, and the unsmoothed ones likewise
+    to bleu_n_nosmooth.*.
+    :param rows: iterable of rows of statistics of max_order.
+    :param max_order: int.
+    :param n_grams: List[int], the orders to score.
+    :param type: string, the field of BleuScore to write.
+    :param output_dir: string.
+    :param format: string, one of SCORE_FORMATS.
+    :return: Dict[int, float], the system score of every order.
+    """
+    for n in n_grams:
+        if not 1 <= n <= max_order:
+            raise ValueError('order must be within [1, %d], got %d' % (max_order, n))
     output_dir = Path(output_dir)
-    output = output_dir.joinpath(name).with_suffix('.json')
-
-    scores = [
-        getattr(bleu_sentence_level(trans, ref, max_order=n, smooth=True), type)
-        for trans, ref in zip(translations, references)
-    ]
-
-    system = getattr(bleu_corpus_level(
-        translation_corpus=translations,
-        reference_corpus=references,
-        max_order=n,
-        smooth=True,
-    ), type)
-
-    write_score(
-        name=name,
-        scores=scores,
-        system=system,
-        output=output,
-        params={
-            'type': type,
-            'n': n,
-            'smooth': True,
+    writers = {}
+    totals = {}
+    seconds = 0.0
+    with contextlib.ExitStack() as stack:
+        for n in n_grams:
+            for smooth in (True, False):
+                writers[n, smooth] = stack.enter_context(open_score_writer(
+                    output_dir.joinpath('%s.%s' % (_metric_name(n, smooth), format)), format,
+                    columns=n if type == 'precisions' else None))
+            totals[n] = [0] * statistics_width(n)
+        for row in rows:
+            # Only the scoring and writing are timed, the rows may be computed lazily.
+            start = time.perf_counter() if profiler else None
+            for n in n_grams:
+                # The statistics of order n are a slice of those of max_order.
+                row_n = truncate_statistics_row(row, max_order, n)
+                for smooth in (True, False):
+                    writers[n, smooth].write(
+                        getattr(bleu_from_statistics(row_n, smooth=smooth), type))
+                total = totals[n]
+                for i, value in enumerate(row_n):
+                    total[i] += value
+            if profiler:
+                seconds += time.perf_counter() - start
+    if profiler:
+        profiler.add_time('write', seconds)
+
+    systems = {}
+    for n in n_grams:
+        for smooth in (True, False):
+            name = _metric_name(n, smooth)
+            system = getattr(bleu_from_statistics(totals[n], smooth=smooth), type)
+            write_score(
+                name=name,
+                scores=[],
+                system=system,
+                output=output_dir.joinpath(name).with_suffix('.json'),
+                params={
+                    'type': type,
+                    'n': n,
+                    'smooth': smooth,
+                    'scores_file': '%s.%s' % (name, format),
+                    'scores_format': format,
+                }
+            )
+            if smooth:
+                systems[n] = system
+    return systems
+
+
+def eval_metrics(stats, max_order, args, output_dir):
+    """
+    Write the scores of all the orders of the command line from computed statistics.
+    :param stats: array of statistics as returned by bleu_statistics().
+    :param max_order: int.
+    :param args: the parsed command line.
+    :param output_dir: string.
+    :return: Dict[int, float], the system score of every order.
+    """
+    if args.scores_format != 'json':
+        return eval_metrics_streaming(
+            iter_statistics_rows(stats, max_order), max_order, args.n_grams, args.type,
+            output_dir, args.scores_format, profiler=args.profiler)
+    return {
+        n: eval_metric(
+            stats=stats,
+            max_order=max_order,
+            n=n,
+            type=args.type,
+            output_dir=output_dir,
+            profiler=args.profiler,
+        )
+        for n in args.n_grams
+    }
+
+
+def compute_statistics(translation_file, ref_files, max_order, args):
+    """
+    Compute the per-segment statistics of a translation file.
+    :param translation_file: string.
+    :param ref_files: List[string].
+    :param max_order: int.
+    :param args: the parsed command line, for the cache, worker and profile options.
+    :return: array of statistics as returned by bleu_statistics().
+    """
+    profiler = args.profiler
+    if args.stats_cache:
+        # Only the segments scored by no previous run are scored.
+        translations = load_translation_corpus(translation_file, profiler=profiler)
+        references = load_reference_corpus(ref_files, profiler=profiler)
+        with _statistics_cache(args) as cache, \
+                profiler.stage('statistics') if profiler else contextlib.nullcontext():
+            return cached_statistics(
+                translation_corpus=translations,
+                reference_corpus=references,
+                cache=cache,
+                max_order=max_order,
+                engine='integer',
+                workers=args.workers,
+                chunksize=args.chunksize,
+            )
+    if args.mmap:
+        with profiler.stage('load') if profiler else contextlib.nullcontext():
+            translations, references = load_encoded_corpus(
+                translation_file, ref_files, workers=args.workers)
+        with profiler.stage('statistics') if profiler else contextlib.nullcontext():
+            return binary_statistics(translations, references, max_order=max_order)
+    if args.cache_dir:
+        # Parse the files only when they changed since the last run.
+        with _cached_corpus([translation_file], args.cache_dir) as translations, \
+                _cached_corpus(ref_files, args.cache_dir) as references:
+            if profiler is None:
+                return binary_statistics(translations, references, max_order=max_order)
+            with profiler.stage('statistics'):
+                stats = binary_statistics(translations, references, max_order=max_order)
+            profiler.count('segments', len(translations))
+            return stats
+    if args.workers > 1:
+        return bleu_statistics(
+            translation_corpus=load_translation_corpus(translation_file, profiler=profiler),
+            reference_corpus=load_reference_corpus(ref_files, profiler=profiler),
+            max_order=max_order,
+            workers=args.workers,
+            chunksize=args.chunksize,
+            profiler=profiler,
+        )
+    # Stream the files so that no token lists are kept in memory.
+    stats = array.array(STATISTICS_TYPECODE)
+    for row in iter_bleu_statistics(
+        iter_corpus(translation_file, ref_files, profiler=profiler),
+        max_order=max_order,
+        profiler=profiler,
+    ):
+        stats.extend(row)
+    return stats
+
+
+def eval_significance(stats, baseline_stats, max_order, n_grams, n_samples, output_dir):
+    from bleu.significance import paired_bootstrap
+
+    results = {}
+    for n in n_grams:
+        result = paired_bootstrap(
+            truncate_statistics(stats, max_order=max_order, order=n),
+            truncate_statistics(baseline_stats, max_order=max_order, order=n),
+            max_order=n,
+            smooth=True,
+            n_samples=n_samples,
+        )
+        results['bleu_%d' % n] = {
+            'system': result.score_a.bleu,
+            'baseline': result.score_b.bleu,
+            'delta': result.delta,
+            'low': result.low,
+            'high': result.high,
+            'p_value': result.p_value,
         }
+    with Path(output_dir).joinpath('significance.json').open('w') as f:
+        json.dump(results, f, indent=2)
+
+
+def eval_smoothing(stats, max_order, n_grams, output_dir, scores_format, sentence=True):
+    """
+    Score every smoothing method at every order from one extraction, writing the
+    grid to smoothing.json. The sentence scores are in the JSON too, or in
+    smoothing.npy of shape (methods, orders, segments) with the npy scores format.
+    :param stats: array of statistics as returned by bleu_statistics().
+    :param max_order: int.
+    :param n_grams: List[int], the orders to score.
+    :param output_dir: string.
+    :param scores_format: string, the --scores-format.
+    :param sentence: bool, whether to write the sentence scores.
+    """
+    from bleu.smoothing import smoothing_sweep
+
+    sweep = smoothing_sweep(stats, max_order=max_order, orders=n_grams)
+    output_dir = Path(output_dir)
+    grid = {}
+    for i, method in enumerate(sweep.methods):
+        grid[method] = {}
+        for j, n in enumerate(sweep.orders):
+            grid[method]['bleu_%d' % n] = {'system': float(sweep.corpus[i, j])}
+            if sentence and scores_format != 'npy':
+                grid[method]['bleu_%d' % n]['scores'] = sweep.sentence[i, j].tolist()
+    if sentence and scores_format == 'npy':
+        import numpy as np
+
+        np.save(output_dir.joinpath('smoothing.npy'), sweep.sentence.astype(np.float32))
+    with output_dir.joinpath('smoothing.json').open('w') as f:
+        json.dump(grid, f, indent=2)
+
+
+def eval_system(args, translation_file, max_order):
+    """
+    Score a single system, writing its scores right in the output dir.
+    :param args: the parsed command line.
+    :param translation_file: string.
+    :param max_order: int.
+    """
+    if args.scores_format != 'json' and not (
+            args.write_stats or args.compare or args.cache_dir or args.stats_cache
+            or args.mmap or args.smoothing_sweep or args.workers > 1):
+        # Nothing needs the statistics of all segments at once: stream them from the
+        # files to the score files.
+        eval_metrics_streaming(
+            iter_bleu_statistics(
+                iter_corpus(translation_file, args.references, profiler=args.profiler),
+                max_order=max_order,
+                profiler=args.profiler,
+            ),
+            max_order, args.n_grams, args.type, args.output_dir, args.scores_format,
+            profiler=args.profiler)
+        return
+
+    stats = compute_statistics(translation_file, args.references, max_order, args)
+    if args.write_stats:
+        write_statistics(
+            Path(args.output_dir).joinpath('statistics.json'), stats, max_order,
+            segments=args.write_segments, metadata={'translation': str(translation_file)})
+
+    eval_metrics(stats, max_order, args, args.output_dir)
+    if args.smoothing_sweep:
+        eval_smoothing(stats, max_order, args.n_grams, args.output_dir, args.scores_format)
+
+    if args.compare:
+        eval_significance(
+            stats=stats,
+            baseline_stats=compute_statistics(args.compare, args.references, max_order, args),
+            max_order=max_order,
+            n_grams=args.n_grams,
+            n_samples=args.bootstrap,
+            output_dir=args.output_dir,
+        )
+
+
+# The ReferenceIndex shared by the processes scoring systems in parallel.
+_reference_index = None
+
+
+def _set_reference_index(index):
+    global _reference_index
+    _reference_index = index
+
+
+def _system_statistics(translation_file):
+    return bleu_statistics(
+        translation_corpus=load_translation_corpus(translation_file),
+        reference_corpus=_reference_index,
+        max_order=_reference_index.max_order,
     )
 
 
+def _expand_systems(patterns):
+    """
+    Expand the glob patterns among the translation files.
+    :param patterns: List[string].
+    :return: List[string], the translation files.
+    """
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise ValueError('no translation file matches %r' % pattern)
+        files.extend(matches)
+    return files
+
+
+def _system_names(files):
+    """
+    Name each system after its file. Systems whose files share a stem are told apart
+    by their position, so that every name is a single safe path component.
+    :param files: List[string].
+    :return: List[string].
+    """
+    stems = [Path(file).stem for file in files]
+    names = []
+    for i, stem in enumerate(stems):
+        name = stem if stems.count(stem) == 1 else '%s-%d' % (stem, i + 1)
+        while name in names or (name != stem and name in stems):
+            name += '_'
+        names.append(name)
+    return names
+
+
+def eval_systems(args, translation_files, max_order):
+    """
+    Score many systems against references loaded and indexed only once.
+    :param args: the parsed command line.
+    :param translation_files: List[string].
+    :param max_order: int.
+    """
+    profiler = args.profiler
+    references = load_reference_corpus(args.references, profiler=profiler)
+    files = list(translation_files)
+    if args.compare:
+        files.append(args.compare)
+    if not args.stats_cache:
+        # The cache scores its misses alone, so only the other paths need the index.
+        with profiler.stage('index') if profiler else contextlib.nullcontext():
+            index = ReferenceIndex(references, max_order=max_order, engine='integer')
+    with profiler.stage('statistics') if profiler else contextlib.nullcontext():
+        if args.stats_cache:
+            with _statistics_cache(args) as cache:
+                all_stats = [
+                    cached_statistics(
+                        load_translation_corpus(file), references, cache, max_order,
+                        engine='integer', workers=args.workers, chunksize=args.chunksize)
+                    for file in files
+                ]
+        elif args.workers > 1:
+            with concurrent.futures.ProcessPoolExecutor(
+                    args.workers, initializer=_set_reference_index,
+                    initargs=(index,)) as executor:
+                all_stats = list(executor.map(_system_statistics, files))
+        else:
+            _set_reference_index(index)
+            all_stats = [_system_statistics(file) for file in files]
+    if profiler:
+        profiler.count('segments', len(references) * len(files))
+
+    summary = {}
+    for name, file, stats in zip(_system_names(translation_files), translation_files, all_stats):
+        output_dir = Path(args.output_dir).joinpath(name)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        summary[name] = {
+            'file': str(file),
+            'scores': {
+                'bleu_%d' % n: system
+                for n, system in eval_metrics(stats, max_order, args, output_dir).items()
+            },
+        }
+        if args.write_stats:
+            write_statistics(
+                output_dir.joinpath('statistics.json'), stats, max_order,
+                segments=args.write_segments, metadata={'translation': str(file)})
+        if args.smoothing_sweep:
+            eval_smoothing(stats, max_order, args.n_grams, output_dir, args.scores_format)
+        if args.compare:
+            eval_significance(
+                stats=stats,
+                baseline_stats=all_stats[-1],
+                max_order=max_order,
+                n_grams=args.n_grams,
+                n_samples=args.bootstrap,
+                output_dir=output_dir,
+            )
+    summary_file = args.summary or Path(args.output_dir).joinpath('systems.json')
+    with open(summary_file, 'w') as f:
+        json.dump(summary, f, indent=2)
+
+
+def eval_merged(args):
+    """
+    Score the corpus made of shards from their statistics files.
+    The corpus scores are written to merged.json in the output dir, and the sentence
+    scores too when every file holds the rows of its segments.
+    :param args: the parsed command line.
+    """
+    merged = merge_statistics(args.merge_stats)
+    if merged.rows is not None:
+        scores = {
+            'bleu_%d' % n: system
+            for n, system in eval_metrics(
+                merged.rows, merged.max_order, args, args.output_dir).items()
+        }
+    else:
+        scores = {
+            'bleu_%d' % n: getattr(bleu_from_statistics(
+                truncate_statistics(merged.totals, max_order=merged.max_order, order=n),
+                smooth=True,
+            ), args.type)
+            for n in args.n_grams
+        }
+    with Path(args.output_dir).joinpath('merged.json').open('w') as f:
+        json.dump({'n_segments': merged.n_segments, 'scores': scores}, f, indent=2)
+    if args.smoothing_sweep:
+        # Without rows, the totals are scored as a corpus of one segment.
+        eval_smoothing(
+            merged.totals if merged.rows is None else merged.rows, merged.max_order,
+            args.n_grams, args.output_dir, args.scores_format,
+            sentence=merged.rows is not None)
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-    parser.add_argument('-t', dest="translations")
+    parser.add_argument('-t', dest="translations", nargs='+',
+                        help='translation files or glob patterns, one per system')
     parser.add_argument('-r', dest="references", nargs='+')
     parser.add_argument("-n", "--n_grams", nargs='+', type=int)
     parser.add_argument('--type', choices=('bleu', 'geo_mean', 'precisions'), default='bleu')
     parser.add_argument('-p', dest='output_dir')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes to score the corpus with, '
+                             'or to score the systems with when there are several')
+    parser.add_argument('--chunksize', type=int, default=1000,
+                        help='number of segments a worker process scores at a time')
+    parser.add_argument('--cache-dir',
+                        help='directory of binary caches of the tokenized input files')
+    parser.add_argument('--stats-cache', metavar='FILE',
+                        help='database of the statistics of the segments already scored, '
+                             'so that only new or changed segments are scored')
+    parser.add_argument('--stats-cache-size', type=float, metavar='MB',
+                        help='size the statistics cache is bounded to, by evicting '
+                             'the least recently used segments')
+    parser.add_argument('--write-stats', action='store_true',
+                        help='write the statistics totals of each system to statistics.json '
+                             'in its output dir, to be merged with those of other shards')
+    parser.add_argument('--write-segments', action='store_true',
+                        help='write the statistics of every segment with --write-stats')
+    parser.add_argument('--merge-stats', nargs='+', metavar='FILE',
+                        help='statistics files of the shards of a corpus to score, '
+                             'instead of translation and reference files')
+    parser.add_argument('--mmap', action='store_true',
+                        help='load the files by mapping them in memory and tokenizing them '
+                             'into token ids, with up to --workers processes')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='translation file of a baseline to test the significance against')
+    parser.add_argument('--bootstrap', type=int, default=1000,
+                        help='number of bootstrap samples of the significance test')
+    parser.add_argument('--summary',
+                        help='file of the scores of all systems keyed by system name, '
+                             'default to systems.json in the output dir')
+    parser.add_argument('--scores-format', choices=('json',) + SCORE_FORMATS, default='json',
+                        help='format of the sentence scores: all in the JSON of the system '
+                             'score, or streamed to a JSON-lines or float32 .npy file per order')
+    parser.add_argument('--smoothing-sweep', action='store_true',
+                        help='also score every smoothing method of bleu.smoothing at every '
+                             'order, writing the grid to smoothing.json (needs NumPy)')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the time, throughput and peak memory of each stage to stderr')
     args = parser.parse_args()
+    args.profiler = Profiler() if args.profile else None
 
-    translations = load_translation_corpus(args.translations)
-    references = load_reference_corpus(args.references)
-
-    for n in args.n_grams:
-        eval_metric(
-            translations=translations,
-            references=references,
-            n=n,
-            type=args.type,
-            output_dir=args.output_dir,
-        )
+    # Extract and clip the n-grams once for all the requested orders.
+    max_order = max(args.n_grams)
+    if args.merge_stats:
+        eval_merged(args)
+    else:
+        translation_files = _expand_systems(args.translations)
+        if len(translation_files) > 1 and (args.cache_dir or args.mmap):
+            parser.error('--cache-dir and --mmap only apply to a single translation file')
+        if len(translation_files) > 1:
+            eval_systems(args, translation_files, max_order)
+        else:
+            eval_system(args, translation_files[0], max_order)
+    if args.profiler is not None:
+        print(args.profiler.format(), file=sys.stderr)
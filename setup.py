@@ -22,6 +22,10 @@ setup(
     package_data={
         'bleu.tests': ['data/*'],
     },
+    python_requires='>=3.7',
+    extras_require={
+        'numpy': ['numpy'],
+    },
     scripts=['bin/bleu_metric.py'],
     classifiers=[
         'Intended Audience :: Science/Research',